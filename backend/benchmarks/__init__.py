@@ -0,0 +1 @@
+# This file is intentionally empty to make the benchmarks directory a Python package
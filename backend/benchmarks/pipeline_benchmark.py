@@ -0,0 +1,259 @@
+"""
+Stage-level micro-benchmarks for the RAG pipeline
+
+Times each stage of process_cv, aquery_cv and agenerate_application separately on a corpus of
+PDFs: PDF load, splitting, embedding (against a deterministic stub), building the in-memory CV
+matrix and searching it (the default RETRIEVAL_MODE), context assembly, prompt assembly and
+_markdown_to_html. With --with-db, inserts into and the collection-scoped search of
+UserVectorStore (RETRIEVAL_MODE=database) are timed too. Results are written as JSON so runs
+can be compared across commits:
+
+    python -m benchmarks.pipeline_benchmark --output bench.json
+    python -m benchmarks.pipeline_benchmark --with-db --compare bench.json --threshold 0.2
+
+Without --fixtures, a synthetic corpus of 1, 3 and 10 page CVs is generated. The PGVector
+stages need a database and only run with --with-db, against a throwaway collection.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from config import settings
+from loadtest.pdf_fixtures import build_cv_pdf
+from services.context_assembly import assemble_context
+from services.cv_matrix_cache import CVMatrix
+from services.rag_service import rag_service, CHAT_MODEL, APPLICATION_MODEL
+
+QUESTION = "What programming languages and frameworks does the candidate know?"
+
+JOB_DESCRIPTION = (
+    "We are hiring a Software Engineering Intern to build REST APIs with Python and FastAPI, "
+    "work with PostgreSQL, and ship features end to end with a small product team."
+)
+
+COMPLETION = (
+    "Dear Hiring Manager,\n\n"
+    "I am excited to apply. My experience with **Python**, __FastAPI__ and *PostgreSQL* "
+    "matches the role, and I have shipped _production_ services.\n\n"
+) * 6
+
+
+class StubEmbeddings(Embeddings):
+    """Deterministic pseudo-random unit vectors, so the embedding stage measures no network time"""
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+
+    def _embed(self, text: str) -> list:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        vector = np.random.default_rng(seed).standard_normal(self.dimension)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: list) -> list:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list:
+        return self._embed(text)
+
+
+def time_stage(fn: Callable, iterations: int, warmup: int) -> dict:
+    """Run fn warmup + iterations times and summarize the timed runs in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples = np.array(samples)
+    return {
+        "iterations": iterations,
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "min_ms": float(samples.min()),
+        "max_ms": float(samples.max()),
+    }
+
+
+def load_corpus(fixtures: str) -> Dict[str, bytes]:
+    if fixtures:
+        paths = sorted(glob.glob(os.path.join(fixtures, "*.pdf")))
+        if not paths:
+            raise SystemExit(f"No PDFs found in {fixtures}")
+        return {os.path.basename(path): open(path, "rb").read() for path in paths}
+    return {f"synthetic_{pages}p.pdf": build_cv_pdf(pages) for pages in (1, 3, 10)}
+
+
+def benchmark_document(name: str, pdf_bytes: bytes, args, embeddings: StubEmbeddings) -> dict:
+    stages = {}
+    docs = rag_service._load_pdf(pdf_bytes, name)
+    splits = rag_service.text_splitter.split_documents(docs)
+    texts = [d.page_content for d in splits]
+    vectors = embeddings.embed_documents(texts)
+    matrix = CVMatrix(texts, vectors)
+    chat_query = embeddings.embed_query(QUESTION)
+    application_query = embeddings.embed_query(JOB_DESCRIPTION)
+    # The same k and models _retrieve_context uses for chat and applications
+    chat_chunks = [text for text, _ in matrix.top_k(chat_query, 8)]
+    application_chunks = [text for text, _ in matrix.top_k(application_query, 10)]
+    chat_context, _ = assemble_context(chat_chunks, CHAT_MODEL)
+    application_context, _ = assemble_context(application_chunks, APPLICATION_MODEL)
+
+    stages["pdf_load"] = time_stage(lambda: rag_service._load_pdf(pdf_bytes, name), args.iterations, args.warmup)
+    stages["split"] = time_stage(lambda: rag_service.text_splitter.split_documents(docs), args.iterations, args.warmup)
+    stages["embed_stub"] = time_stage(lambda: embeddings.embed_documents(texts), args.iterations, args.warmup)
+    stages["cv_matrix_build"] = time_stage(lambda: CVMatrix(texts, vectors), args.iterations, args.warmup)
+    stages["matrix_top_k"] = time_stage(lambda: matrix.top_k(chat_query, 8), args.iterations, args.warmup)
+
+    if args.with_db:
+        stages.update(benchmark_vector_store(splits, vectors, embeddings, args))
+
+    stages["context_assembly_chat"] = time_stage(
+        lambda: assemble_context(chat_chunks, CHAT_MODEL), args.iterations, args.warmup
+    )
+    stages["context_assembly_application"] = time_stage(
+        lambda: assemble_context(application_chunks, APPLICATION_MODEL), args.iterations, args.warmup
+    )
+    stages["prompt_chat"] = time_stage(
+        lambda: rag_service._chat_request(chat_context, QUESTION), args.iterations, args.warmup
+    )
+    stages["prompt_cover_letter"] = time_stage(
+        lambda: rag_service._cover_letter_request(application_context, JOB_DESCRIPTION), args.iterations, args.warmup
+    )
+    stages["prompt_email"] = time_stage(
+        lambda: rag_service._email_request(application_context, JOB_DESCRIPTION), args.iterations, args.warmup
+    )
+    stages["markdown_to_html"] = time_stage(
+        lambda: rag_service._markdown_to_html(COMPLETION), args.iterations, args.warmup
+    )
+
+    return {
+        "bytes": len(pdf_bytes),
+        "pages": len(docs),
+        "chunks": len(splits),
+        "stages": stages,
+    }
+
+
+def benchmark_vector_store(splits: list, vectors: list, embeddings: StubEmbeddings, args) -> dict:
+    """Time inserts into and collection-scoped searches over a throwaway UserVectorStore collection"""
+    from database import engine
+    from services.vector_store import UserVectorStore
+
+    store = UserVectorStore(
+        connection_string=settings.DATABASE_URL,
+        embedding_function=embeddings,
+        collection_name=f"benchmark_{uuid.uuid4().hex}",
+        connection=engine,
+        create_extension=False
+    )
+    texts = [d.page_content for d in splits]
+    metadatas = [d.metadata for d in splits]
+    query_vector = embeddings.embed_query(QUESTION)
+    try:
+        stages = {
+            "pgvector_insert": time_stage(
+                lambda: store.add_embeddings(texts, vectors, metadatas), args.iterations, args.warmup
+            ),
+            "scoped_search": time_stage(
+                lambda: store.similarity_search_by_vector(query_vector, k=8), args.iterations, args.warmup
+            ),
+        }
+    finally:
+        store.delete_collection()
+    return stages
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Stages whose p50 grew by more than threshold (a fraction) against the baseline run"""
+    regressions = []
+    for name, document in results["documents"].items():
+        base_document = baseline.get("documents", {}).get(name)
+        if not base_document:
+            continue
+        for stage, stats in document["stages"].items():
+            base_stats = base_document["stages"].get(stage)
+            if not base_stats or not base_stats["p50_ms"]:
+                continue
+            change = stats["p50_ms"] / base_stats["p50_ms"] - 1
+            if change > threshold:
+                regressions.append(
+                    f"{name} {stage}: p50 {base_stats['p50_ms']:.2f}ms -> {stats['p50_ms']:.2f}ms (+{change:.0%})"
+                )
+    return regressions
+
+
+def print_results(results: dict):
+    for name, document in results["documents"].items():
+        print(f"\n{name}: {document['pages']} pages, {document['chunks']} chunks")
+        print(f"  {'stage':<28} {'p50 ms':>10} {'p95 ms':>10} {'mean ms':>10}")
+        for stage, stats in document["stages"].items():
+            print(f"  {stage:<28} {stats['p50_ms']:>10.3f} {stats['p95_ms']:>10.3f} {stats['mean_ms']:>10.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", help="Directory of PDFs to benchmark (defaults to a synthetic corpus)")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--with-db", action="store_true", help="Also time PGVector insert and scoped search")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Earlier results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p50 growth counted as a regression")
+    args = parser.parse_args()
+
+    embeddings = StubEmbeddings(settings.EMBEDDING_DIMENSION)
+    corpus = load_corpus(args.fixtures)
+    results = {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "with_db": args.with_db,
+            "chunk_size": rag_service.text_splitter._chunk_size,
+            "chunk_overlap": rag_service.text_splitter._chunk_overlap,
+            "retrieval_mode": settings.RETRIEVAL_MODE,
+            "vector_index_type": settings.VECTOR_INDEX_TYPE,
+        },
+        "documents": {
+            name: benchmark_document(name, pdf_bytes, args, embeddings)
+            for name, pdf_bytes in corpus.items()
+        },
+    }
+    print_results(results)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions over {args.threshold:.0%} against {args.compare}")
@@ -0,0 +1,209 @@
+"""
+Retrieval latency as langchain_pg_embedding grows
+
+Fills the embedding table with synthetic collections (one per simulated user) up to each target
+size, then times a top-k search in a random collection two ways:
+
+- langchain: PGVector's default search, an exact scan joined against langchain_pg_collection
+- scoped: UserVectorStore's collection-scoped search, which can use the indexes maintained by
+  services.vector_index (VECTOR_INDEX_TYPE, VECTOR_HNSW_EF_SEARCH, VECTOR_IVFFLAT_PROBES)
+
+Recall@k of the scoped search is measured against the exact langchain results. Query
+embedding is not timed; this is the database part of chat retrieval.
+
+    python -m benchmarks.vector_search_benchmark --sizes 10000,100000,1000000 --output ann.json
+    python -m benchmarks.vector_search_benchmark --cleanup
+
+Rows are generated server-side in collections named benchmark_ann_*, which are kept between
+runs so larger sizes build on smaller ones; --cleanup deletes them.
+"""
+import argparse
+import json
+import platform
+import random
+import time
+from datetime import datetime
+from typing import List
+import numpy as np
+from sqlalchemy import text
+from config import settings
+from database import engine
+from benchmarks.pipeline_benchmark import StubEmbeddings, git_commit
+from services.vector_index import ensure_vector_indexes, EMBEDDING_TABLE
+
+COLLECTION_PREFIX = "benchmark_ann_"
+
+INSERT_COLLECTIONS = text(
+    "INSERT INTO langchain_pg_collection (uuid, name, cmetadata) "
+    "SELECT gen_random_uuid(), :prefix || g, '{}'::json FROM generate_series(:first, :last) g"
+)
+
+# The correlated reference to chunk makes Postgres draw a new random vector for every row
+INSERT_EMBEDDINGS = text(
+    f"INSERT INTO {EMBEDDING_TABLE} (uuid, collection_id, embedding, document, cmetadata) "
+    "SELECT gen_random_uuid(), c.uuid, "
+    "(SELECT array_agg(random() - 0.5 + chunk * 0) FROM generate_series(1, :dimension))::vector, "
+    "'benchmark chunk ' || chunk, json_build_object('chunk', chunk) "
+    "FROM langchain_pg_collection c, generate_series(1, :chunks) chunk "
+    "WHERE c.name = ANY(:names)"
+)
+
+
+def benchmark_row_count(connection) -> int:
+    return connection.execute(text(
+        f"SELECT count(*) FROM {EMBEDDING_TABLE} e JOIN langchain_pg_collection c ON c.uuid = e.collection_id "
+        "WHERE c.name LIKE :pattern"
+    ), {"pattern": f"{COLLECTION_PREFIX}%"}).scalar()
+
+
+def benchmark_collections(connection) -> List[str]:
+    rows = connection.execute(
+        text("SELECT name FROM langchain_pg_collection WHERE name LIKE :pattern"),
+        {"pattern": f"{COLLECTION_PREFIX}%"}
+    )
+    return [row.name for row in rows]
+
+
+def grow_to(target_rows: int, chunks_per_collection: int, batch_collections: int):
+    """Insert synthetic collections until the benchmark rows reach target_rows"""
+    with engine.connect() as connection:
+        rows = benchmark_row_count(connection)
+        next_index = len(benchmark_collections(connection))
+        while rows < target_rows:
+            count = min(batch_collections, -(-(target_rows - rows) // chunks_per_collection))
+            names = [f"{COLLECTION_PREFIX}{i}" for i in range(next_index, next_index + count)]
+            connection.execute(INSERT_COLLECTIONS, {
+                "prefix": COLLECTION_PREFIX, "first": next_index, "last": next_index + count - 1
+            })
+            connection.execute(INSERT_EMBEDDINGS, {
+                "dimension": settings.EMBEDDING_DIMENSION, "chunks": chunks_per_collection, "names": names
+            })
+            connection.commit()
+            next_index += count
+            rows += count * chunks_per_collection
+            print(f"  {rows} benchmark rows")
+
+
+def cleanup():
+    with engine.connect() as connection:
+        # langchain_pg_embedding.collection_id cascades on delete
+        deleted = connection.execute(
+            text("DELETE FROM langchain_pg_collection WHERE name LIKE :pattern"),
+            {"pattern": f"{COLLECTION_PREFIX}%"}
+        ).rowcount
+        connection.commit()
+    print(f"Deleted {deleted} benchmark collections")
+
+
+def summarize(samples: List[float]) -> dict:
+    samples = np.array(samples)
+    return {
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "max_ms": float(samples.max()),
+    }
+
+
+def measure(names: List[str], embeddings: StubEmbeddings, args) -> dict:
+    from langchain_community.vectorstores import PGVector
+    from services.vector_store import UserVectorStore
+
+    timings = {"langchain": [], "scoped": []}
+    recalls = []
+    for query_index in range(args.warmup + args.queries):
+        name = random.choice(names)
+        query = embeddings.embed_query(f"benchmark query {query_index}")
+        stores = {
+            store_class: store_class(
+                connection_string=settings.DATABASE_URL,
+                embedding_function=embeddings,
+                collection_name=name,
+                connection=engine,
+                create_extension=False
+            )
+            for store_class in (PGVector, UserVectorStore)
+        }
+
+        start = time.perf_counter()
+        exact = stores[PGVector].similarity_search_by_vector(query, k=args.k)
+        langchain_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        scoped = stores[UserVectorStore].similarity_search_by_vector(query, k=args.k)
+        scoped_ms = (time.perf_counter() - start) * 1000
+
+        if query_index < args.warmup:
+            continue
+        timings["langchain"].append(langchain_ms)
+        timings["scoped"].append(scoped_ms)
+        expected = {doc.page_content for doc in exact}
+        recalls.append(len(expected & {doc.page_content for doc in scoped}) / max(len(expected), 1))
+
+    return {
+        "langchain": summarize(timings["langchain"]),
+        "scoped": summarize(timings["scoped"]),
+        "recall_at_k": float(np.mean(recalls)),
+    }
+
+
+def print_results(results: dict):
+    print(f"\n{'rows':>10} {'method':<10} {'p50 ms':>10} {'p95 ms':>10} {'mean ms':>10} {'recall':>8}")
+    for size in results["sizes"]:
+        for method in ("langchain", "scoped"):
+            stats = size[method]
+            recall = f"{size['recall_at_k']:>8.3f}" if method == "scoped" else f"{'-':>8}"
+            print(f"{size['rows']:>10} {method:<10} {stats['p50_ms']:>10.2f} {stats['p95_ms']:>10.2f} "
+                  f"{stats['mean_ms']:>10.2f} {recall}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated table sizes to measure at")
+    parser.add_argument("--chunks-per-collection", type=int, default=20, help="Chunks per simulated user's CV")
+    parser.add_argument("--batch-collections", type=int, default=500, help="Collections inserted per statement")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--output", default="vector_search_results.json")
+    parser.add_argument("--cleanup", action="store_true", help="Delete the benchmark collections and exit")
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup()
+        raise SystemExit(0)
+
+    embeddings = StubEmbeddings(settings.EMBEDDING_DIMENSION)
+    results = {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "index_type": settings.VECTOR_INDEX_TYPE,
+            "hnsw_m": settings.VECTOR_HNSW_M,
+            "hnsw_ef_construction": settings.VECTOR_HNSW_EF_CONSTRUCTION,
+            "hnsw_ef_search": settings.VECTOR_HNSW_EF_SEARCH,
+            "ivfflat_lists": settings.VECTOR_IVFFLAT_LISTS,
+            "ivfflat_probes": settings.VECTOR_IVFFLAT_PROBES,
+            "iterative_scan": settings.VECTOR_ITERATIVE_SCAN,
+            "chunks_per_collection": args.chunks_per_collection,
+            "queries": args.queries,
+            "k": args.k,
+        },
+        "sizes": [],
+    }
+
+    for target in sorted(int(size) for size in args.sizes.split(",")):
+        print(f"Growing benchmark collections to {target} rows...")
+        grow_to(target, args.chunks_per_collection, args.batch_collections)
+        ensure_vector_indexes()
+        with engine.connect() as connection:
+            names = benchmark_collections(connection)
+            total_rows = connection.execute(text(f"SELECT count(*) FROM {EMBEDDING_TABLE}")).scalar()
+        results["sizes"].append({"rows": total_rows, "target": target, **measure(names, embeddings, args)})
+
+    print_results(results)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.output}")
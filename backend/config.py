@@ -1,22 +1,79 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
+from typing import Dict, Optional
 
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = Field(..., env="DATABASE_URL")
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    VECTOR_STORE_CACHE_SIZE: int = 256  # Per-user vector store handles kept open
+    VECTOR_INDEX_TYPE: str = "none"  # ANN index on langchain_pg_embedding: "none", "hnsw" or "ivfflat"
+    VECTOR_HNSW_M: int = 16
+    VECTOR_HNSW_EF_CONSTRUCTION: int = 64
+    VECTOR_HNSW_EF_SEARCH: int = 40  # Higher is more accurate and slower
+    VECTOR_IVFFLAT_LISTS: int = 0  # 0 sizes the lists from the row count
+    VECTOR_IVFFLAT_PROBES: int = 10  # Higher is more accurate and slower
+    VECTOR_ITERATIVE_SCAN: Optional[str] = "relaxed_order"  # pgvector >= 0.8 only; "strict_order", or empty to disable
+    RETRIEVAL_MODE: str = "memory"  # "memory" (NumPy over cached per-CV matrices) or "database" (pgvector search)
+    CV_MATRIX_CACHE_MAX_MB: int = 256  # Memory for cached CV matrices in "memory" mode
+    CONTEXT_TOKEN_BUDGET: int = 2000  # Estimated tokens of CV context per prompt
+    CONTEXT_TOKEN_BUDGETS: Dict[str, int] = {  # Per-model overrides, as JSON in the environment
+        "meta-llama/Llama-3.2-3B-Instruct": 1500,
+        "deepseek-ai/DeepSeek-V3.2": 2500,
+    }
     
     # JWT
     SECRET_KEY: str = Field(..., env="SECRET_KEY")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440  # 24 hours
+    USER_CACHE_SIZE: int = 10000  # Authenticated users kept in-process
+    USER_CACHE_TTL: int = 60  # Seconds before a cached user is re-read from the database
     
     # Cloudinary
     CLOUDINARY_CLOUD_NAME: str = Field(..., env="CLOUDINARY_CLOUD_NAME")
     CLOUDINARY_API_KEY: str = Field(..., env="CLOUDINARY_API_KEY")
     CLOUDINARY_API_SECRET: str = Field(..., env="CLOUDINARY_API_SECRET")
+    CLOUDINARY_UPLOAD_PREFIX: Optional[str] = None  # API base URL override, e.g. the load-test fake server
     
     # HuggingFace
     HUGGINGFACE_API_KEY: str = Field(..., env="HUGGINGFACE_API_KEY")
+    LLM_API_URL: str = "https://router.huggingface.co/v1/chat/completions"
+    EMBEDDING_API_URL: str = "https://router.huggingface.co/hf-inference/models/{model_id}/pipeline/feature-extraction"
+    EMBEDDING_BACKEND: str = "api"  # "api" (HuggingFace router) or "local" (sentence-transformers on CPU)
+    EMBEDDING_DIMENSION: int = 768  # Must match the vectors already stored in langchain_pg_embedding
+    LOCAL_EMBEDDING_MODEL: str = "sentence-transformers/all-mpnet-base-v2"
+    LOCAL_EMBEDDING_THREADS: int = 2  # Torch threads for local inference
+    EMBEDDING_BATCH_SIZE: int = 32  # Inputs sent per feature-extraction call
+    EMBEDDING_MAX_CONCURRENCY: int = 4  # Batches in flight at once
+    EMBEDDING_CONNECT_TIMEOUT: float = 5.0  # Seconds
+    EMBEDDING_READ_TIMEOUT: float = 60.0  # Seconds per feature-extraction call
+    QUERY_EMBEDDING_CACHE_SIZE: int = 1024  # Cached query embeddings (0 disables)
+    QUERY_EMBEDDING_CACHE_TTL: int = 600  # Seconds
+    SEMANTIC_CACHE_ENABLED: bool = True  # Reuse chat answers for paraphrased questions
+    SEMANTIC_CACHE_THRESHOLD: float = 0.9  # Minimum cosine similarity for a cache hit
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 50  # Cached answers per user
+    SEMANTIC_CACHE_MAX_USERS: int = 1000
+    SEMANTIC_CACHE_TTL: int = 3600  # Seconds
+    APPLICATION_CACHE_ENABLED: bool = False  # Reuse earlier generations for identical requests
+    APPLICATION_BATCH_MAX_ITEMS: int = 20  # Job descriptions accepted per batch request
+    APPLICATION_BATCH_CONCURRENCY: int = 4  # Generations in flight at once per batch request
+    IDEMPOTENCY_KEY_TTL: int = 600  # Seconds a completed response is replayed for the same Idempotency-Key
+    IDEMPOTENCY_CACHE_SIZE: int = 10000
+    # CV processing jobs: "background" runs them in the API process, "queue" leaves them to worker.py
+    CV_PROCESSING_MODE: str = "background"
+    CV_WORKER_POOL_SIZE: int = 2
+    CV_JOB_MAX_ATTEMPTS: int = 3
+    CV_JOB_RETRY_BACKOFF: int = 30  # Seconds before the first retry, doubled for each later one
+    CV_JOB_POLL_INTERVAL: float = 2.0  # Seconds between queue polls when idle
+    CV_JOB_STALE_AFTER: int = 900  # Seconds without progress before a running job is reclaimed
+    CV_INCREMENTAL_INDEXING: bool = True  # Diff chunks on re-index instead of rebuilding the collection
+    PDF_EXTRACTION_WORKERS: int = 2  # Processes in the shared pool for page-parallel text extraction
+    PDF_PARALLEL_PAGE_THRESHOLD: int = 8  # Smaller PDFs are extracted in-process
+    PDF_MAX_PAGES: int = 50
+    PDF_EXTRACTION_TIMEOUT: int = 60  # Seconds per document
+    LLM_MAX_CONNECTIONS: int = 200  # Keep-alive pool shared by all async LLM calls
+    LLM_TIMEOUT: float = 120.0  # Seconds
     
     class Config:
         env_file = ".env"
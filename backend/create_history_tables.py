@@ -1,17 +1,48 @@
 """
 Script to create new database tables for chat and application history
 """
+from sqlalchemy import text
 from database import engine, Base
-from models import User, CV, ChatMessage, Application
+from models import User, CV, ChatMessage, Application, EmbeddingCache, CVProcessingJob
+from services.vector_index import ensure_vector_indexes
+
+# Columns added to existing tables, which create_all does not alter
+COLUMN_MIGRATIONS = [
+    "ALTER TABLE applications ADD COLUMN IF NOT EXISTS cv_id INTEGER",
+    "ALTER TABLE applications ADD COLUMN IF NOT EXISTS job_description_hash VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS ix_applications_cache_key "
+    "ON applications (user_id, cv_id, job_description_hash)",
+    # Keyset pagination of history
+    "CREATE INDEX IF NOT EXISTS ix_chat_messages_user_created "
+    "ON chat_messages (user_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_applications_user_created "
+    "ON applications (user_id, created_at, id)",
+]
 
 def create_tables():
     print("Creating database tables...")
+    # embedding_cache stores pgvector columns
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
     Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for statement in COLUMN_MIGRATIONS:
+            conn.execute(text(statement))
     print("Tables created successfully!")
     print("- users")
     print("- cvs")
     print("- chat_messages (new)")
+    print("  + (user_id, created_at, id) index (history pagination)")
     print("- applications (new)")
+    print("  + cv_id, job_description_hash (application cache)")
+    print("  + (user_id, created_at, id) index (history pagination)")
+    print("- embedding_cache (new)")
+    print("- cv_processing_jobs (new)")
+    
+    if ensure_vector_indexes():
+        print("- langchain_pg_embedding: collection_id and ANN indexes")
+    else:
+        print("- langchain_pg_embedding not created yet; run `python -m services.vector_index` later")
 
 if __name__ == "__main__":
     create_tables()
@@ -0,0 +1 @@
+# This file is intentionally empty to make the loadtest directory a Python package
@@ -0,0 +1,189 @@
+"""
+Local stand-in for the external services the backend calls, for load testing without real API costs
+
+Implements the HuggingFace router chat-completions API (including stream=true), the
+feature-extraction API and the Cloudinary upload/destroy calls, with configurable latency and
+failure rate. Run it, then point the backend at it:
+
+    python -m loadtest.fake_services --port 8100 --latency-ms 300 --failure-rate 0.01
+
+    LLM_API_URL=http://localhost:8100/v1/chat/completions
+    EMBEDDING_API_URL=http://localhost:8100/hf-inference/models/{model_id}/pipeline/feature-extraction
+    CLOUDINARY_UPLOAD_PREFIX=http://localhost:8100
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+import uuid
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="Fake LLM/Embedding/Cloudinary Services")
+
+# Overridden from the command line
+config = {
+    "latency_ms": 200.0,  # Mean time to first byte
+    "jitter_ms": 50.0,  # Standard deviation of the latency
+    "token_delay_ms": 10.0,  # Delay between streamed chunks
+    "failure_rate": 0.0,  # Fraction of requests answered with a 503
+    "dimension": 768,
+}
+
+COVER_LETTER = (
+    "Dear Hiring Manager,\n\n"
+    "I am excited to apply for this role. My experience with **Python**, FastAPI and "
+    "PostgreSQL matches the requirements you describe, and I have shipped _production_ "
+    "services used by thousands of people.\n\n"
+    "I would welcome the chance to discuss how I can contribute to your team.\n\n"
+    "Sincerely,\nCandidate"
+)
+
+EMAIL = (
+    "SUBJECT: Application for Software Engineering Intern\n\n"
+    "BODY:\n"
+    "Dear Hiring Team,\n\n"
+    "I am writing to apply for the internship. I have built REST APIs with FastAPI and "
+    "worked with PostgreSQL and pgvector.\n\n"
+    "I would be glad to talk further.\n\n"
+    "Best regards,\nCandidate"
+)
+
+CHAT_ANSWER = (
+    "Based on the CV, the candidate has experience with **Python**, FastAPI and PostgreSQL, "
+    "and has worked on several web applications."
+)
+
+
+async def _simulate_latency():
+    delay = max(0.0, random.gauss(config["latency_ms"], config["jitter_ms"])) / 1000
+    await asyncio.sleep(delay)
+
+
+def _should_fail() -> bool:
+    return random.random() < config["failure_rate"]
+
+
+def _failure() -> JSONResponse:
+    return JSONResponse(status_code=503, content={"error": "Simulated upstream failure"})
+
+
+def _completion_text(messages: list) -> str:
+    """Pick a canned completion shaped like what the prompt asks for"""
+    system = " ".join(m.get("content", "") for m in messages if m.get("role") == "system").lower()
+    if "writing compelling job application emails" in system:
+        return EMAIL
+    if "writing compelling cover letters" in system:
+        return COVER_LETTER
+    return CHAT_ANSWER
+
+
+def _fake_embedding(text: str) -> list:
+    """Deterministic unit vector derived from the text, so identical inputs embed identically"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+    vector = np.random.default_rng(seed).standard_normal(config["dimension"])
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if _should_fail():
+        return _failure()
+    await _simulate_latency()
+
+    content = _completion_text(body.get("messages", []))
+    model = body.get("model", "fake-model")
+    if not body.get("stream"):
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }]
+        }
+
+    async def events():
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        # Word-sized chunks, keeping the whitespace so the stream reassembles exactly
+        pieces = [piece for piece in content.replace("\n", "\n\0").replace(" ", " \0").split("\0") if piece]
+        for piece in pieces:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(config["token_delay_ms"] / 1000)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/hf-inference/models/{model_id:path}/pipeline/feature-extraction")
+async def feature_extraction(model_id: str, request: Request):
+    body = await request.json()
+    if _should_fail():
+        return _failure()
+    await _simulate_latency()
+
+    inputs = body.get("inputs")
+    if isinstance(inputs, list):
+        return [_fake_embedding(text) for text in inputs]
+    return _fake_embedding(inputs)
+
+
+@app.post("/v1_1/{cloud_name}/{resource_type}/upload")
+async def cloudinary_upload(cloud_name: str, resource_type: str, request: Request):
+    form = await request.form()
+    if _should_fail():
+        return _failure()
+    await _simulate_latency()
+
+    public_id = form.get("public_id") or uuid.uuid4().hex
+    if form.get("folder"):
+        public_id = f"{form.get('folder')}/{public_id}"
+    url = f"{request.base_url}fake-cloudinary/{cloud_name}/{resource_type}/{public_id}"
+    return {
+        "public_id": public_id,
+        "resource_type": resource_type,
+        "url": url,
+        "secure_url": url
+    }
+
+
+@app.post("/v1_1/{cloud_name}/{resource_type}/destroy")
+async def cloudinary_destroy(cloud_name: str, resource_type: str):
+    await _simulate_latency()
+    return {"result": "ok"}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=config["latency_ms"])
+    parser.add_argument("--jitter-ms", type=float, default=config["jitter_ms"])
+    parser.add_argument("--token-delay-ms", type=float, default=config["token_delay_ms"])
+    parser.add_argument("--failure-rate", type=float, default=config["failure_rate"])
+    parser.add_argument("--dimension", type=int, default=config["dimension"])
+    args = parser.parse_args()
+
+    config.update(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        token_delay_ms=args.token_delay_ms,
+        failure_rate=args.failure_rate,
+        dimension=args.dimension
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
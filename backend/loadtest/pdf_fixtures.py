@@ -0,0 +1,71 @@
+from typing import List
+
+SECTIONS = [
+    ("Experience", [
+        "Backend Engineering Intern, Example Corp (2023 - 2024)",
+        "Built REST APIs with FastAPI and PostgreSQL serving 10,000 daily users",
+        "Reduced p95 latency of the search endpoint by 40% with query caching",
+        "Introduced pgvector-based semantic search for the support knowledge base",
+    ]),
+    ("Projects", [
+        "RAG CV Assistant: retrieval-augmented chat over uploaded CVs",
+        "Realtime Chat: WebSocket chat app with React and Redis pub/sub",
+        "Expense Tracker: mobile app built with React Native and Expo",
+    ]),
+    ("Skills", [
+        "Languages: Python, TypeScript, SQL, Java",
+        "Frameworks: FastAPI, React, Next.js, SQLAlchemy, LangChain",
+        "Tools: Docker, PostgreSQL, Redis, Git, GitHub Actions",
+    ]),
+    ("Education", [
+        "BSc (Hons) in Computer Science, Example University (2021 - 2025)",
+        "Relevant coursework: Databases, Distributed Systems, Machine Learning",
+    ]),
+]
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def build_pdf(pages: List[List[str]]) -> bytes:
+    """A minimal text PDF with one page per list of lines, so tests need no fixture files"""
+    font_ref = 3 + 2 * len(pages)
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [" + " ".join(f"{3 + 2 * i} 0 R" for i in range(len(pages)))
+        + f"] /Count {len(pages)} >>",
+    ]
+    for index, lines in enumerate(pages):
+        text_ops = "BT /F1 11 Tf 72 740 Td 14 TL " + " ".join(f"({_escape(line)}) '" for line in lines) + " ET"
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_ref} 0 R >> >> /Contents {4 + 2 * index} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(text_ops)} >>\nstream\n{text_ops}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref_offset = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        pdf += f"{offset:010d} 00000 n \n".encode("latin-1")
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("latin-1")
+    return pdf
+
+
+def build_cv_pdf(page_count: int, name: str = "Jane Doe") -> bytes:
+    """A synthetic CV of page_count pages, each filled with the usual CV sections"""
+    pages = []
+    for page in range(page_count):
+        lines = [f"{name} - Software Engineering Student (page {page + 1})", ""]
+        for heading, items in SECTIONS:
+            lines.append(heading.upper())
+            lines.extend(f"- {item}" for item in items)
+            lines.append("")
+        pages.append(lines)
+    return build_pdf(pages)
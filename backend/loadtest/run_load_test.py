@@ -0,0 +1,222 @@
+"""
+End-to-end load test for the backend API
+
+Signs up a set of test users and uploads a CV for each. It then runs a concurrent mix of
+/api/auth/login, /api/chat/ask and /api/application/generate requests, and reports
+p50/p95/p99 latency and throughput per endpoint. The uploads themselves are timed too. Start
+the backend against loadtest.fake_services to avoid real API costs:
+
+    python -m loadtest.run_load_test --base-url http://localhost:8000 --users 20 --concurrency 50 --duration 60
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import defaultdict
+from typing import Optional
+import httpx
+import numpy as np
+from loadtest.pdf_fixtures import build_pdf
+
+QUESTIONS = [
+    "What programming languages does the candidate know?",
+    "Summarize the candidate's work experience.",
+    "What projects has the candidate built?",
+    "What is the candidate's education background?",
+    "Which databases has the candidate used?",
+]
+
+JOB_DESCRIPTION = (
+    "We are hiring a Software Engineering Intern to build REST APIs with Python and FastAPI, "
+    "work with PostgreSQL, and ship features end to end with a small product team."
+)
+
+CV_LINES = [
+    "Jane Doe - Software Engineering Student",
+    "Skills: Python, FastAPI, PostgreSQL, pgvector, React, Docker",
+    "Experience: Backend intern at Example Corp, built REST APIs serving 10k users",
+    "Projects: RAG-based CV assistant, real-time chat application",
+    "Education: BSc Computer Science, Example University",
+]
+
+
+class Recorder:
+    """Collects per-endpoint latencies and outcomes"""
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.status_codes = defaultdict(lambda: defaultdict(int))
+
+    async def call(self, name: str, request) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError as e:
+            self.errors[name] += 1
+            self.status_codes[name][type(e).__name__] += 1
+            return None
+        self.latencies[name].append(time.perf_counter() - start)
+        self.status_codes[name][str(response.status_code)] += 1
+        if response.status_code >= 400:
+            self.errors[name] += 1
+        return response
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            samples = np.array(self.latencies[name]) * 1000
+            count = len(samples)
+            endpoints[name] = {
+                "requests": count,
+                "errors": self.errors[name],
+                "status_codes": dict(self.status_codes[name]),
+                "throughput_rps": count / elapsed if elapsed else 0.0,
+                "p50_ms": float(np.percentile(samples, 50)) if count else None,
+                "p95_ms": float(np.percentile(samples, 95)) if count else None,
+                "p99_ms": float(np.percentile(samples, 99)) if count else None,
+                "mean_ms": float(samples.mean()) if count else None,
+            }
+        total = sum(endpoint["requests"] for endpoint in endpoints.values())
+        return {
+            "elapsed_s": elapsed,
+            "total_requests": total,
+            "total_errors": sum(self.errors.values()),
+            "throughput_rps": total / elapsed if elapsed else 0.0,
+            "endpoints": endpoints,
+        }
+
+
+async def setup_user(client: httpx.AsyncClient, recorder: Recorder, run_id: str, index: int,
+                     password: str, pdf: bytes, process_timeout: float) -> Optional[dict]:
+    """Create a test user, upload their CV and wait until it has been processed"""
+    email = f"loadtest-{run_id}-{index}@example.com"
+    response = await client.post("/api/auth/signup", json={"email": email, "password": password})
+    if response.status_code != 200:
+        print(f"Signup failed for {email}: {response.status_code} {response.text}")
+        return None
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    response = await recorder.call("POST /api/cv/upload", client.post(
+        "/api/cv/upload",
+        headers=headers,
+        files={"file": ("cv.pdf", pdf, "application/pdf")}
+    ))
+    if response is None or response.status_code != 200:
+        print(f"CV upload failed for {email}")
+        return None
+
+    deadline = time.monotonic() + process_timeout
+    while time.monotonic() < deadline:
+        status = (await client.get("/api/cv/status", headers=headers)).json()
+        if status.get("cv", {}).get("processed"):
+            return {"email": email, "password": password, "headers": headers}
+        processing = status.get("processing") or {}
+        if processing.get("status") == "failed":
+            print(f"CV processing failed for {email}: {processing.get('error')}")
+            return None
+        await asyncio.sleep(1.0)
+    print(f"CV processing timed out for {email}")
+    return None
+
+
+async def run_operation(client: httpx.AsyncClient, recorder: Recorder, user: dict, mix: dict):
+    operation = random.choices(list(mix), weights=list(mix.values()))[0]
+    if operation == "login":
+        await recorder.call("POST /api/auth/login", client.post(
+            "/api/auth/login",
+            json={"email": user["email"], "password": user["password"]}
+        ))
+    elif operation == "chat":
+        await recorder.call("POST /api/chat/ask", client.post(
+            "/api/chat/ask",
+            headers=user["headers"],
+            json={"question": random.choice(QUESTIONS)}
+        ))
+    else:
+        await recorder.call("POST /api/application/generate", client.post(
+            "/api/application/generate",
+            headers=user["headers"],
+            json={
+                "job_description": JOB_DESCRIPTION,
+                "application_type": random.choice(["cover_letter", "email"]),
+                "force_refresh": True
+            }
+        ))
+
+
+async def run_load_test(args) -> dict:
+    pdf = open(args.pdf, "rb").read() if args.pdf else build_pdf([CV_LINES])
+    run_id = uuid.uuid4().hex[:8]
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        print(f"Setting up {args.users} users (run {run_id})...")
+        setup_start = time.perf_counter()
+        users = await asyncio.gather(*[
+            setup_user(client, recorder, run_id, index, args.password, pdf, args.process_timeout)
+            for index in range(args.users)
+        ])
+        users = [user for user in users if user]
+        print(f"{len(users)} users ready in {time.perf_counter() - setup_start:.1f}s")
+        if not users:
+            raise SystemExit("No users could be set up")
+
+        mix = {"login": args.login_weight, "chat": args.chat_weight, "generate": args.generate_weight}
+        stop_at = time.monotonic() + args.duration
+        issued = 0
+
+        async def worker(worker_index: int):
+            nonlocal issued
+            while time.monotonic() < stop_at and (not args.requests or issued < args.requests):
+                issued += 1
+                user = users[(worker_index + issued) % len(users)]
+                await run_operation(client, recorder, user, mix)
+
+        print(f"Running mixed load with {args.concurrency} concurrent clients...")
+        start = time.perf_counter()
+        await asyncio.gather(*[worker(index) for index in range(args.concurrency)])
+        elapsed = time.perf_counter() - start
+
+    results = recorder.report(elapsed)
+    results["config"] = {key: value for key, value in vars(args).items() if key != "password"}
+    return results
+
+
+def print_report(results: dict):
+    print()
+    print(f"{'endpoint':<32} {'reqs':>7} {'errs':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in results["endpoints"].items():
+        percentiles = [
+            f"{stats[key]:>9.1f}" if stats[key] is not None else f"{'-':>9}"
+            for key in ("p50_ms", "p95_ms", "p99_ms")
+        ]
+        print(f"{name:<32} {stats['requests']:>7} {stats['errors']:>6} {stats['throughput_rps']:>8.1f} {' '.join(percentiles)}")
+    print(f"\nTotal: {results['total_requests']} requests, {results['total_errors']} errors, "
+          f"{results['throughput_rps']:.1f} req/s over {results['elapsed_s']:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=10, help="Test users to create, each with a CV")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent clients in the mixed phase")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run the mixed phase")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests (0 = duration only)")
+    parser.add_argument("--login-weight", type=float, default=1.0)
+    parser.add_argument("--chat-weight", type=float, default=3.0)
+    parser.add_argument("--generate-weight", type=float, default=1.0)
+    parser.add_argument("--pdf", help="CV to upload (defaults to a generated one-page PDF)")
+    parser.add_argument("--password", default="loadtest-password")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--process-timeout", type=float, default=300.0, help="Seconds to wait for CV processing")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_load_test(args))
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
@@ -1,7 +1,13 @@
-from fastapi import FastAPI
+import time
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from starlette.routing import Match
 from routes import auth, cv, chat, application
 from database import engine, Base
+from services.llm_client import llm_client
+from services.metrics import REQUEST_LATENCY, server_timing_header, start_request_timings
+from services.rag_service import rag_service
 
 # Create database tables (disabled for production, use Alembic or manual migration)
 # Base.metadata.create_all(bind=engine)
@@ -27,6 +33,37 @@ app.include_router(cv.router, prefix="/api/cv", tags=["CV Management"])
 app.include_router(chat.router, prefix="/api/chat", tags=["Chat"])
 app.include_router(application.router, prefix="/api/application", tags=["Application Generation"])
 
+def _route_template(request: Request) -> str:
+    """The matched route's path template, so metrics aren't labelled per user or id"""
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    timings = start_request_timings()
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    REQUEST_LATENCY.labels(request.method, _route_template(request), response.status_code).observe(elapsed)
+    # Streaming responses only include the stages finished before the body started
+    response.headers["Server-Timing"] = server_timing_header(timings, elapsed)
+    return response
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.on_event("startup")
+def check_embedding_dimension():
+    rag_service.verify_embedding_dimension()
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    await llm_client.aclose()
+
 @app.get("/")
 def read_root():
     return {"message": "RAG CV System API is running"}
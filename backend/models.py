@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Index, JSON
 from sqlalchemy.orm import relationship
+from pgvector.sqlalchemy import Vector
 from datetime import datetime
 from database import Base
 
@@ -41,6 +42,10 @@ class ChatMessage(Base):
     
     # Relationship to User
     user = relationship("User", back_populates="chat_messages")
+    
+    __table_args__ = (
+        Index("ix_chat_messages_user_created", "user_id", "created_at", "id"),
+    )
 
 class Application(Base):
     __tablename__ = "applications"
@@ -51,7 +56,48 @@ class Application(Base):
     application_type = Column(String, nullable=False)  # 'cover_letter' or 'email'
     subject = Column(String, nullable=True)  # Only for emails
     content = Column(Text, nullable=False)
+    # CV version and normalized job description hash, used to reuse identical generations
+    cv_id = Column(Integer, nullable=True)
+    job_description_hash = Column(String(64), nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationship to User
     user = relationship("User", back_populates="applications")
+    
+    __table_args__ = (
+        Index("ix_applications_cache_key", "user_id", "cv_id", "job_description_hash"),
+        Index("ix_applications_user_created", "user_id", "created_at", "id"),
+    )
+
+class EmbeddingCache(Base):
+    __tablename__ = "embedding_cache"
+    
+    # Content-addressed: sha256 of the chunk text, scoped to the embedding model
+    content_hash = Column(String(64), primary_key=True)
+    model = Column(String, primary_key=True)
+    embedding = Column(Vector(), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class CVProcessingJob(Base):
+    __tablename__ = "cv_processing_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    # Not foreign keys: CV rows are replaced on re-upload, and the job history should outlive them
+    cv_id = Column(Integer, nullable=False, index=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    pdf_url = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued")  # queued, running, succeeded, failed, cancelled
+    stage = Column(String, nullable=True)  # download, parse, split, embed, store
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    last_error = Column(Text, nullable=True)
+    result = Column(JSON, nullable=True)  # Chunk reuse stats from process_cv
+    worker_id = Column(String, nullable=True)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_cv_processing_jobs_claim", "status", "next_attempt_at"),
+    )
@@ -1,61 +1,164 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from database import get_db
-from models import User, CV, Application
-from schemas import ApplicationRequest, CoverLetterResponse, EmailResponse, ApplicationHistoryResponse
-from utils.dependencies import get_current_user
+from database import get_db, SessionLocal
+from models import Application
+from schemas import (
+    AuthenticatedUser, ApplicationRequest, CoverLetterResponse, EmailResponse,
+    ApplicationHistoryResponse, ApplicationSummary, ApplicationHistoryPage,
+    ApplicationBatchRequest, ApplicationBatchResult, ApplicationBatchResponse, CombinedApplicationResponse
+)
+from config import settings
+from services.application_cache import job_description_hash
+from utils.dependencies import get_current_user, get_processed_cv
+from utils.idempotency import run_idempotent
+from utils.pagination import keyset_page
+from utils.sse import format_sse, SSE_HEADERS
 from services.rag_service import rag_service
-from typing import Union, List
+from typing import Dict, List, Union, Optional
+import re
+
+SNIPPET_LENGTH = 200  # Characters of content and job description in history summaries
 
 router = APIRouter()
 
-@router.post("/generate", response_model=Union[CoverLetterResponse, EmailResponse])
-def generate_application(
-    request: ApplicationRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Generate a personalized cover letter or email based on CV and job description"""
-    # Validate application type
-    if request.application_type not in ["cover_letter", "email"]:
+def _validate_application_type(application_type: str, allow_both: bool = False):
+    if allow_both and application_type == "both":
+        return
+    if application_type not in ["cover_letter", "email"]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="application_type must be either 'cover_letter' or 'email'"
+            detail="application_type must be 'cover_letter', 'email' or 'both'" if allow_both
+            else "application_type must be either 'cover_letter' or 'email'"
         )
-    
-    # Check if user has uploaded a CV
-    cv = db.query(CV).filter(CV.user_id == current_user.id).first()
-    if not cv:
+
+def _use_cache(request: ApplicationRequest) -> bool:
+    return settings.APPLICATION_CACHE_ENABLED and not request.force_refresh
+
+def _new_application(user_id: int, cv_id: int, job_description: str, application_type: str, result: dict) -> Application:
+    return Application(
+        user_id=user_id,
+        job_description=job_description,
+        application_type=application_type,
+        subject=result.get("subject"),
+        content=result["content"],
+        cv_id=cv_id,
+        job_description_hash=job_description_hash(job_description)
+    )
+
+def _save_application(user_id: int, cv_id: int, job_description: str, application_type: str, result: dict) -> int:
+    """Save a generated application with its own session (used once a stream completes)"""
+    db = SessionLocal()
+    try:
+        application = _new_application(user_id, cv_id, job_description, application_type, result)
+        db.add(application)
+        db.commit()
+        return application.id
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def _validate_batch(request: ApplicationBatchRequest):
+    if not request.items:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Please upload your CV first"
+            detail="items must not be empty"
         )
-    
-    # Check if CV is processed
-    if not cv.processed:
+    if len(request.items) > settings.APPLICATION_BATCH_MAX_ITEMS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Your CV is still being processed. Please try again in a moment."
+            detail=f"A batch can contain at most {settings.APPLICATION_BATCH_MAX_ITEMS} items"
         )
+    for item in request.items:
+        _validate_application_type(item.application_type)
+
+def _batch_result(index: int, item: ApplicationRequest, result: Optional[dict], error: Optional[str]) -> ApplicationBatchResult:
+    if error is not None:
+        return ApplicationBatchResult(index=index, application_type=item.application_type, status="error", error=error)
+    return ApplicationBatchResult(
+        index=index,
+        application_type=item.application_type,
+        status="ok",
+        id=result.get("application_id"),
+        subject=result.get("subject"),
+        content=result["content"],
+        cached=result["cached"]
+    )
+
+def _save_batch(user_id: int, cv_id: int, items: List[ApplicationRequest], results: Dict[int, dict]) -> Dict[int, int]:
+    """Save every newly generated application of a batch in one transaction, returning index -> id"""
+    db = SessionLocal()
+    try:
+        applications = {
+            index: _new_application(user_id, cv_id, items[index].job_description, items[index].application_type, result)
+            for index, result in results.items()
+        }
+        db.add_all(applications.values())
+        db.commit()
+        return {index: application.id for index, application in applications.items()}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+@router.post("/generate", response_model=Union[CoverLetterResponse, EmailResponse, CombinedApplicationResponse])
+async def generate_application(
+    request: ApplicationRequest,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """
+    Generate a personalized cover letter or email based on CV and job description
+    
+    When APPLICATION_CACHE_ENABLED is set, an identical earlier request (same CV, job description
+    and type) is answered from history unless `force_refresh` is true. With application_type
+    'both', a cover letter and an email are generated from one retrieval and both are saved.
+    A retry carrying the same `Idempotency-Key` header replays the first response.
+    """
+    _validate_application_type(request.application_type, allow_both=True)
+    return await run_idempotent(
+        current_user.id,
+        "POST /api/application/generate",
+        idempotency_key,
+        request,
+        lambda: _generate_application(request, current_user, db)
+    )
+
+async def _generate_application(
+    request: ApplicationRequest,
+    current_user: AuthenticatedUser,
+    db: Session
+) -> Union[CoverLetterResponse, EmailResponse, CombinedApplicationResponse]:
+    # Database work runs in the threadpool; only the LLM call is awaited on the event loop
+    cv = await run_in_threadpool(get_processed_cv, db, current_user.id)
+    
+    if request.application_type == "both":
+        return await _generate_both(request, current_user.id, cv.id, db)
     
     try:
         # Generate application using RAG service
-        result = rag_service.generate_application(
+        result = await rag_service.agenerate_application(
             current_user.id, 
             request.job_description, 
-            request.application_type
+            request.application_type,
+            cv_version=cv.id,
+            use_cache=_use_cache(request)
         )
         
-        # Save application to history
-        application = Application(
-            user_id=current_user.id,
-            job_description=request.job_description,
-            application_type=request.application_type,
-            subject=result.get("subject"),
-            content=result["content"]
-        )
-        db.add(application)
-        db.commit()
+        # Save application to history (cached results already have their row, and a coalesced
+        # duplicate of an in-flight request leaves saving to that request)
+        if not result["cached"] and not result["coalesced"]:
+            application = _new_application(
+                current_user.id, cv.id, request.job_description, request.application_type, result
+            )
+            db.add(application)
+            await run_in_threadpool(db.commit)
         
         # Return appropriate response based on type
         if request.application_type == "cover_letter":
@@ -70,23 +173,238 @@ def generate_application(
             detail=f"Error generating application: {str(e)}"
         )
 
-@router.get("/history", response_model=List[ApplicationHistoryResponse])
+async def _generate_both(request: ApplicationRequest, user_id: int, cv_id: int, db: Session) -> CombinedApplicationResponse:
+    try:
+        results = await rag_service.agenerate_both_applications(
+            user_id,
+            request.job_description,
+            cv_version=cv_id,
+            use_cache=_use_cache(request)
+        )
+        
+        # Both new rows are saved in the same commit
+        for application_type, result in results.items():
+            if not result["cached"] and not result["coalesced"]:
+                db.add(_new_application(user_id, cv_id, request.job_description, application_type, result))
+        await run_in_threadpool(db.commit)
+        
+        return CombinedApplicationResponse(
+            cover_letter=CoverLetterResponse(**results["cover_letter"]),
+            email=EmailResponse(**results["email"])
+        )
+    
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error generating application: {str(e)}"
+        )
+
+@router.post("/generate/stream")
+async def generate_application_stream(
+    request: ApplicationRequest,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Generate a cover letter or email, streaming it as Server-Sent Events
+    
+    Emits a `subject` event for emails as soon as the subject line is ready, `content` events
+    with HTML fragments of the body, then a `done` event with the saved application, or an
+    `error` event if generation fails part-way. A `content` event with `replace: true` holds the
+    whole body and replaces the fragments before it (sent when an email completion falls back).
+    """
+    _validate_application_type(request.application_type)
+    cv = await run_in_threadpool(get_processed_cv, db, current_user.id)
+    
+    try:
+        events = await rag_service.astream_application(
+            current_user.id,
+            request.job_description,
+            request.application_type,
+            cv_version=cv.id,
+            use_cache=_use_cache(request)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error generating application: {str(e)}"
+        )
+    
+    user_id = current_user.id
+    cv_id = cv.id
+    job_description = request.job_description
+    application_type = request.application_type
+    
+    async def event_stream():
+        result = None
+        try:
+            async for event, data in events:
+                if event == "result":
+                    result = data
+                else:
+                    yield format_sse(event, data)
+        except Exception as e:
+            yield format_sse("error", {"detail": f"Error generating application: {str(e)}"})
+            return
+        
+        # The request's session is closed once the response starts, so save with a fresh one
+        try:
+            if result["cached"]:
+                application_id = result.pop("application_id")
+            else:
+                application_id = await run_in_threadpool(
+                    _save_application, user_id, cv_id, job_description, application_type, result
+                )
+            yield format_sse("done", {"id": application_id, "application_type": application_type, **result})
+        except Exception as e:
+            yield format_sse("error", {"detail": f"Error saving application: {str(e)}"})
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.post("/generate/batch", response_model=ApplicationBatchResponse)
+async def generate_application_batch(
+    request: ApplicationBatchRequest,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """
+    Generate applications for several job descriptions at once
+    
+    Query embeddings are computed in one batch and generations run concurrently, up to
+    APPLICATION_BATCH_CONCURRENCY at a time. Each item succeeds or fails on its own; the
+    successful ones are saved together in a single transaction. A retry carrying the same
+    `Idempotency-Key` header replays the first response.
+    """
+    _validate_batch(request)
+    return await run_idempotent(
+        current_user.id,
+        "POST /api/application/generate/batch",
+        idempotency_key,
+        request,
+        lambda: _generate_application_batch(request, current_user, db)
+    )
+
+async def _generate_application_batch(
+    request: ApplicationBatchRequest,
+    current_user: AuthenticatedUser,
+    db: Session
+) -> ApplicationBatchResponse:
+    cv = await run_in_threadpool(get_processed_cv, db, current_user.id)
+    
+    items = request.items
+    results = {}
+    outcomes = {}
+    async for index, result, error in rag_service.agenerate_applications(
+        current_user.id,
+        [(item.job_description, item.application_type, _use_cache(item)) for item in items],
+        cv_version=cv.id
+    ):
+        outcomes[index] = (result, error)
+        if result is not None and not result["cached"]:
+            results[index] = result
+    
+    try:
+        saved = await run_in_threadpool(_save_batch, current_user.id, cv.id, items, results)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error saving applications: {str(e)}"
+        )
+    for index, application_id in saved.items():
+        results[index]["application_id"] = application_id
+    
+    return ApplicationBatchResponse(results=[
+        _batch_result(index, items[index], *outcomes[index]) for index in range(len(items))
+    ])
+
+@router.post("/generate/batch/stream")
+async def generate_application_batch_stream(
+    request: ApplicationBatchRequest,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Generate applications for several job descriptions, streaming each as Server-Sent Events
+    
+    Emits a `result` event per item as soon as it finishes (in completion order, carrying its
+    `index`), then a `done` event with the ids of the saved applications once the whole batch
+    has been stored in one transaction, or an `error` event if saving fails.
+    """
+    _validate_batch(request)
+    cv = await run_in_threadpool(get_processed_cv, db, current_user.id)
+    
+    user_id = current_user.id
+    cv_id = cv.id
+    items = request.items
+    outcomes = rag_service.agenerate_applications(
+        user_id,
+        [(item.job_description, item.application_type, _use_cache(item)) for item in items],
+        cv_version=cv_id
+    )
+    
+    async def event_stream():
+        results = {}
+        async for index, result, error in outcomes:
+            if result is not None and not result["cached"]:
+                results[index] = result
+            yield format_sse("result", _batch_result(index, items[index], result, error).model_dump())
+        
+        try:
+            saved = await run_in_threadpool(_save_batch, user_id, cv_id, items, results)
+        except Exception as e:
+            yield format_sse("error", {"detail": f"Error saving applications: {str(e)}"})
+            return
+        yield format_sse("done", {"saved": [{"index": index, "id": application_id} for index, application_id in saved.items()]})
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+def _plain_snippet(html: str) -> str:
+    """Plain-text preview from the start of stored HTML content"""
+    text = re.sub(r"<br\s*/?>", " ", html)
+    # The excerpt may end inside a tag, so unterminated tags are dropped too
+    text = re.sub(r"<[^>]*>?", "", text)
+    return " ".join(text.split())
+
+@router.get("/history", response_model=ApplicationHistoryPage)
 def get_application_history(
-    limit: int = 50,
-    current_user: User = Depends(get_current_user),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get application history for the current user"""
-    applications = db.query(Application).filter(
-        Application.user_id == current_user.id
-    ).order_by(Application.created_at.desc()).limit(limit).all()
+    """Get a page of application summaries, newest first; full content is at /history/{id}"""
+    # Only excerpts of the text columns are read, not the full letters
+    query = db.query(
+        Application.id,
+        Application.application_type,
+        Application.subject,
+        Application.created_at,
+        func.substr(Application.content, 1, SNIPPET_LENGTH).label("content_excerpt"),
+        func.substr(Application.job_description, 1, SNIPPET_LENGTH).label("job_description_excerpt")
+    ).filter(Application.user_id == current_user.id)
+    rows, next_cursor = keyset_page(query, Application, limit, cursor)
     
-    return applications
+    return ApplicationHistoryPage(
+        items=[
+            ApplicationSummary(
+                id=row.id,
+                application_type=row.application_type,
+                subject=row.subject,
+                snippet=_plain_snippet(row.content_excerpt),
+                job_description_snippet=row.job_description_excerpt,
+                created_at=row.created_at
+            )
+            for row in rows
+        ],
+        next_cursor=next_cursor
+    )
 
 @router.get("/history/{application_id}", response_model=ApplicationHistoryResponse)
 def get_application_detail(
     application_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get a specific application by ID"""
@@ -106,7 +424,7 @@ def get_application_detail(
 @router.delete("/history/{application_id}")
 def delete_application(
     application_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete a specific application"""
@@ -128,7 +446,7 @@ def delete_application(
 
 @router.delete("/history")
 def clear_application_history(
-    current_user: User = Depends(get_current_user),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Clear all application history for the current user"""
@@ -1,52 +1,81 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from database import get_db
-from models import User, CV, ChatMessage
-from schemas import ChatRequest, ChatResponse, ChatMessageResponse
-from utils.dependencies import get_current_user
+from database import get_db, SessionLocal
+from models import ChatMessage
+from schemas import AuthenticatedUser, ChatRequest, ChatResponse, ChatHistoryPage
+from utils.dependencies import get_current_user, get_processed_cv
+from utils.idempotency import run_idempotent
+from utils.pagination import keyset_page
+from utils.sse import format_sse, SSE_HEADERS
 from services.rag_service import rag_service
-from typing import List
+from typing import Optional
 
 router = APIRouter()
 
+def _save_chat_message(user_id: int, question: str, answer: str) -> int:
+    """Save a chat message with its own session (used once a streamed answer completes)"""
+    db = SessionLocal()
+    try:
+        chat_message = ChatMessage(
+            user_id=user_id,
+            question=question,
+            answer=answer
+        )
+        db.add(chat_message)
+        db.commit()
+        return chat_message.id
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
 @router.post("/ask", response_model=ChatResponse)
-def ask_question(
+async def ask_question(
     chat_request: ChatRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None)
 ):
-    """Ask a question about the user's CV"""
-    # Check if user has uploaded a CV
-    cv = db.query(CV).filter(CV.user_id == current_user.id).first()
-    if not cv:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Please upload your CV first"
-        )
+    """
+    Ask a question about the user's CV
     
-    # Check if CV is processed
-    if not cv.processed:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Your CV is still being processed. Please try again in a moment."
-        )
+    A retry carrying the same `Idempotency-Key` header replays the first response instead of
+    asking again.
+    """
+    return await run_idempotent(
+        current_user.id,
+        "POST /api/chat/ask",
+        idempotency_key,
+        chat_request,
+        lambda: _ask_question(chat_request, current_user, db)
+    )
+
+async def _ask_question(chat_request: ChatRequest, current_user: AuthenticatedUser, db: Session) -> ChatResponse:
+    # Database work runs in the threadpool; only the LLM call is awaited on the event loop
+    cv = await run_in_threadpool(get_processed_cv, db, current_user.id)
     
     try:
         # Query using RAG service
-        answer = rag_service.query_cv(current_user.id, chat_request.question)
+        result = await rag_service.aquery_cv(current_user.id, chat_request.question, cv_version=cv.id)
+        answer = result["answer"]
         
-        # Save chat message to history
-        chat_message = ChatMessage(
-            user_id=current_user.id,
-            question=chat_request.question,
-            answer=answer
-        )
-        db.add(chat_message)
-        db.commit()
+        # Save chat message to history, unless an identical in-flight request already does
+        if not result["coalesced"]:
+            chat_message = ChatMessage(
+                user_id=current_user.id,
+                question=chat_request.question,
+                answer=answer
+            )
+            db.add(chat_message)
+            await run_in_threadpool(db.commit)
         
         return ChatResponse(
             question=chat_request.question,
-            answer=answer
+            answer=answer,
+            cached=result["cached"]
         )
     except Exception as e:
         db.rollback()
@@ -55,24 +84,70 @@ def ask_question(
             detail=f"Error processing question: {str(e)}"
         )
 
-@router.get("/history", response_model=List[ChatMessageResponse])
+@router.post("/ask/stream")
+async def ask_question_stream(
+    chat_request: ChatRequest,
+    current_user: AuthenticatedUser = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Ask a question about the user's CV, streaming the answer as Server-Sent Events
+    
+    Emits `token` events as the answer is generated, then a single `done` event with the
+    saved message (and whether it came from the answer cache), or an `error` event if
+    generation fails part-way.
+    """
+    cv = await run_in_threadpool(get_processed_cv, db, current_user.id)
+    
+    try:
+        tokens, cached = await rag_service.astream_query_cv(current_user.id, chat_request.question, cv_version=cv.id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error processing question: {str(e)}"
+        )
+    
+    user_id = current_user.id
+    question = chat_request.question
+    
+    async def event_stream():
+        answer_parts = []
+        try:
+            async for token in tokens:
+                answer_parts.append(token)
+                yield format_sse("token", {"token": token})
+        except Exception as e:
+            yield format_sse("error", {"detail": f"Error processing question: {str(e)}"})
+            return
+        
+        answer = "".join(answer_parts)
+        # The request's session is closed once the response starts, so save with a fresh one
+        try:
+            message_id = await run_in_threadpool(_save_chat_message, user_id, question, answer)
+            yield format_sse("done", {"id": message_id, "question": question, "answer": answer, "cached": cached})
+        except Exception as e:
+            yield format_sse("error", {"detail": f"Error saving answer: {str(e)}"})
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.get("/history", response_model=ChatHistoryPage)
 def get_chat_history(
-    limit: int = 50,
-    current_user: User = Depends(get_current_user),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get chat history for the current user"""
-    messages = db.query(ChatMessage).filter(
-        ChatMessage.user_id == current_user.id
-    ).order_by(ChatMessage.created_at.desc()).limit(limit).all()
+    """Get the latest page of chat history, or the page before cursor"""
+    query = db.query(ChatMessage).filter(ChatMessage.user_id == current_user.id)
+    messages, next_cursor = keyset_page(query, ChatMessage, limit, cursor)
     
     # Reverse to show oldest first
-    return list(reversed(messages))
+    return ChatHistoryPage(items=list(reversed(messages)), next_cursor=next_cursor)
 
 @router.delete("/history/{message_id}")
 def delete_chat_message(
     message_id: int,
-    current_user: User = Depends(get_current_user),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete a specific chat message"""
@@ -94,7 +169,7 @@ def delete_chat_message(
 
 @router.delete("/history")
 def clear_chat_history(
-    current_user: User = Depends(get_current_user),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Clear all chat history for the current user"""
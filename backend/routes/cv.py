@@ -1,23 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, BackgroundTasks
 from sqlalchemy.orm import Session
 from database import get_db
-from models import User, CV
-from schemas import CVResponse
+from models import CV
+from schemas import AuthenticatedUser, CVResponse
 from utils.dependencies import get_current_user
 from services.cloudinary_service import upload_pdf_to_cloudinary, delete_pdf_from_cloudinary
-from services.rag_service import rag_service
+from services.cv_jobs import enqueue_cv_job, latest_job_for_cv, run_job_in_process
+from config import settings
 import uuid
 
 router = APIRouter()
 
 @router.get("/status", response_model=dict)
 def get_cv_status(
-    current_user: User = Depends(get_current_user),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Check if user has uploaded a CV"""
+    """Check if user has uploaded a CV, and how far its processing job has got"""
     cv = db.query(CV).filter(CV.user_id == current_user.id).first()
     if cv:
+        job = latest_job_for_cv(db, cv.id)
         return {
             "has_cv": True,
             "cv": CVResponse(
@@ -26,7 +28,16 @@ def get_cv_status(
                 cloudinary_url=cv.cloudinary_url,
                 uploaded_at=cv.uploaded_at,
                 processed=cv.processed
-            )
+            ),
+            "processing": {
+                "status": job.status,
+                "stage": job.stage,
+                "attempts": job.attempts,
+                "max_attempts": job.max_attempts,
+                "error": job.last_error,
+                "result": job.result,
+                "updated_at": job.updated_at
+            } if job else None
         }
     return {"has_cv": False}
 
@@ -34,7 +45,7 @@ def get_cv_status(
 async def upload_cv(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Upload CV to Cloudinary and process it"""
@@ -75,13 +86,12 @@ async def upload_cv(
     db.commit()
     db.refresh(new_cv)
     
-    # Process CV in background (chunking and storing in ChromaDB)
-    background_tasks.add_task(
-        process_cv_background, 
-        new_cv.id, 
-        current_user.id, 
-        upload_result["url"]
-    )
+    # Queue CV processing (chunking, embedding and storing in pgvector). In "queue" mode a
+    # separate worker.py process picks the job up; otherwise it runs in this process straight
+    # from the uploaded bytes, without downloading the PDF back from Cloudinary.
+    job = enqueue_cv_job(db, new_cv)
+    if settings.CV_PROCESSING_MODE != "queue":
+        background_tasks.add_task(run_job_in_process, job.id, file_content)
     
     return CVResponse(
         id=new_cv.id,
@@ -91,34 +101,9 @@ async def upload_cv(
         processed=new_cv.processed
     )
 
-def process_cv_background(cv_id: int, user_id: int, pdf_url: str):
-    """Background task to process CV"""
-    from database import SessionLocal
-    
-    try:
-        # Process CV with RAG service
-        rag_service.process_cv(user_id, pdf_url)
-        
-        # Update CV as processed
-        db = SessionLocal()
-        cv = db.query(CV).filter(CV.id == cv_id).first()
-        if cv:
-            cv.processed = True
-            db.commit()
-            
-            # Delete PDF from Cloudinary after successful processing
-            try:
-                delete_pdf_from_cloudinary(cv.cloudinary_public_id)
-                print(f"Deleted PDF from Cloudinary for user {user_id}")
-            except Exception as e:
-                print(f"Warning: Could not delete PDF from Cloudinary: {str(e)}")
-        db.close()
-    except Exception as e:
-        print(f"Error processing CV: {str(e)}")
-
 @router.delete("/delete")
 def delete_cv(
-    current_user: User = Depends(get_current_user),
+    current_user: AuthenticatedUser = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Delete user's CV"""
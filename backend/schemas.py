@@ -20,6 +20,11 @@ class UserResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class AuthenticatedUser(BaseModel):
+    """Lightweight principal for the authenticated user, cached between requests"""
+    id: int
+    email: str
+
 class Token(BaseModel):
     access_token: str
     token_type: str
@@ -43,6 +48,7 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     question: str
     answer: str
+    cached: bool = False  # Answer reused from a similar earlier question
 
 class ChatMessageResponse(BaseModel):
     id: int
@@ -53,17 +59,45 @@ class ChatMessageResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ChatHistoryPage(BaseModel):
+    items: List[ChatMessageResponse]  # Oldest first
+    next_cursor: Optional[str] = None  # Pass back to load older messages
+
 # Application generation schemas
 class ApplicationRequest(BaseModel):
     job_description: str
-    application_type: str  # 'cover_letter' or 'email'
+    application_type: str  # 'cover_letter', 'email', or 'both' (generate only)
+    force_refresh: bool = False  # Skip the application cache and generate a new one
 
 class CoverLetterResponse(BaseModel):
     content: str
+    cached: bool = False
 
 class EmailResponse(BaseModel):
     subject: str
     content: str
+    cached: bool = False
+
+class CombinedApplicationResponse(BaseModel):
+    """Response for application_type 'both': a cover letter and an email from one retrieval"""
+    cover_letter: CoverLetterResponse
+    email: EmailResponse
+
+class ApplicationBatchRequest(BaseModel):
+    items: List[ApplicationRequest]
+
+class ApplicationBatchResult(BaseModel):
+    index: int  # Position in the request's items
+    application_type: str
+    status: str  # 'ok' or 'error'
+    id: Optional[int] = None  # Saved application; set once the batch has been stored
+    subject: Optional[str] = None  # Emails only
+    content: Optional[str] = None
+    cached: bool = False
+    error: Optional[str] = None
+
+class ApplicationBatchResponse(BaseModel):
+    results: List[ApplicationBatchResult]  # In request order
 
 class ApplicationHistoryResponse(BaseModel):
     id: int
@@ -75,3 +109,16 @@ class ApplicationHistoryResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+class ApplicationSummary(BaseModel):
+    """History list entry; the full content is served by /history/{id}"""
+    id: int
+    application_type: str
+    subject: Optional[str]
+    snippet: str  # Start of the content as plain text
+    job_description_snippet: str
+    created_at: datetime
+
+class ApplicationHistoryPage(BaseModel):
+    items: List[ApplicationSummary]  # Newest first
+    next_cursor: Optional[str] = None  # Pass back to load older applications
@@ -0,0 +1,50 @@
+import hashlib
+from typing import Optional
+from database import SessionLocal
+from models import Application
+
+
+_lookups = {"hits": 0, "misses": 0}
+
+
+def application_cache_stats() -> dict:
+    return dict(_lookups)
+
+
+def job_description_hash(job_description: str) -> str:
+    """Hash of the job description with case and whitespace differences normalized away"""
+    normalized = " ".join(job_description.split()).lower()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def find_cached_application(
+    user_id: int,
+    cv_version: int,
+    job_description: str,
+    application_type: str
+) -> Optional[dict]:
+    """
+    Return the latest application generated from the same CV for the same job and type
+
+    Application history rows are the backing store, so a new CV (new cv_id) never matches
+    rows generated from the old one.
+    """
+    db = SessionLocal()
+    try:
+        application = db.query(Application).filter(
+            Application.user_id == user_id,
+            Application.cv_id == cv_version,
+            Application.job_description_hash == job_description_hash(job_description),
+            Application.application_type == application_type
+        ).order_by(Application.created_at.desc()).first()
+        if application is None:
+            _lookups["misses"] += 1
+            return None
+        
+        _lookups["hits"] += 1
+        result = {"content": application.content, "application_id": application.id}
+        if application_type == "email":
+            result["subject"] = application.subject
+        return result
+    finally:
+        db.close()
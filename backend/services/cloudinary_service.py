@@ -6,7 +6,8 @@ from config import settings
 cloudinary.config(
     cloud_name=settings.CLOUDINARY_CLOUD_NAME,
     api_key=settings.CLOUDINARY_API_KEY,
-    api_secret=settings.CLOUDINARY_API_SECRET
+    api_secret=settings.CLOUDINARY_API_SECRET,
+    upload_prefix=settings.CLOUDINARY_UPLOAD_PREFIX
 )
 
 def upload_pdf_to_cloudinary(file_content, filename: str):
@@ -0,0 +1,128 @@
+"""
+Prompt context assembly from retrieved CV chunks
+
+RecursiveCharacterTextSplitter repeats up to chunk_overlap characters between neighbouring
+chunks, so joining the top-k chunks as-is sends much of the CV twice. assemble_context drops
+duplicate and contained chunks, stitches chunks whose tail overlaps another's head back into
+one contiguous span, and packs the spans in relevance order into a token budget.
+"""
+import math
+from typing import List, Optional, Tuple
+from config import settings
+from services.metrics import CONTEXT_TOKENS_SAVED
+
+# Rough size of a token for English prose; only used to budget, never to truncate mid-word
+CHARS_PER_TOKEN = 4
+# Shorter shared text is treated as coincidence rather than splitter overlap
+MIN_OVERLAP_CHARS = 20
+# Below this many tokens a truncated span isn't worth including
+MIN_TRUNCATED_TOKENS = 50
+SEPARATOR = "\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def token_budget_for(model: Optional[str]) -> int:
+    return settings.CONTEXT_TOKEN_BUDGETS.get(model, settings.CONTEXT_TOKEN_BUDGET)
+
+
+def _overlap(head: str, tail: str) -> int:
+    """Length of the longest suffix of head that is a prefix of tail (0 if under MIN_OVERLAP_CHARS)"""
+    probe = tail[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return 0
+    position = head.find(probe)
+    while position != -1:
+        if tail.startswith(head[position:]):
+            return len(head) - position
+        position = head.find(probe, position + 1)
+    return 0
+
+
+def merge_chunks(chunks: List[str]) -> List[str]:
+    """
+    Collapse chunks (most relevant first) into non-overlapping spans, keeping relevance order
+
+    A span takes the rank of its most relevant chunk.
+    """
+    spans: List[Tuple[int, str]] = []
+    for rank, chunk in enumerate(chunk.strip() for chunk in chunks):
+        if not chunk or any(chunk in text for _, text in spans):
+            continue
+        # Drop earlier spans this chunk contains, inheriting their rank
+        contained = [span for span in spans if span[1] in chunk]
+        if contained:
+            rank = min(span[0] for span in contained)
+            spans = [span for span in spans if span not in contained]
+        spans.append((rank, chunk))
+
+        merged = True
+        while merged:
+            merged = False
+            for i, (rank_a, a) in enumerate(spans):
+                for j, (rank_b, b) in enumerate(spans):
+                    if i == j:
+                        continue
+                    overlap = _overlap(a, b)
+                    if overlap:
+                        joined = (min(rank_a, rank_b), a + b[overlap:])
+                        spans = [span for k, span in enumerate(spans) if k not in (i, j)] + [joined]
+                        merged = True
+                        break
+                if merged:
+                    break
+
+    return [text for _, text in sorted(spans, key=lambda span: span[0])]
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    """Cut text to max_chars at the last paragraph, line or word break"""
+    cut = text[:max_chars]
+    for separator in ("\n\n", "\n", " "):
+        position = cut.rfind(separator)
+        if position > max_chars // 2:
+            return cut[:position].rstrip()
+    return cut
+
+
+def pack_spans(spans: List[str], budget: int) -> List[str]:
+    """Take spans in order while they fit the token budget, truncating the first that doesn't"""
+    packed = []
+    used = 0
+    for span in spans:
+        cost = estimate_tokens(span) + (estimate_tokens(SEPARATOR) if packed else 0)
+        if used + cost <= budget:
+            packed.append(span)
+            used += cost
+            continue
+        remaining = budget - used
+        if remaining >= MIN_TRUNCATED_TOKENS:
+            packed.append(_truncate(span, remaining * CHARS_PER_TOKEN - len(SEPARATOR)))
+        break
+    return packed
+
+
+def assemble_context(chunks: List[str], model: Optional[str] = None) -> Tuple[str, dict]:
+    """
+    Build the prompt context for model from retrieved chunks, most relevant first
+
+    Returns the context and {"retrieved_tokens", "context_tokens", "saved_overlap", "saved_budget"},
+    and counts the saved tokens in rag_context_tokens_saved_total.
+    """
+    retrieved_tokens = estimate_tokens(SEPARATOR.join(chunks))
+    spans = merge_chunks(chunks)
+    merged_tokens = estimate_tokens(SEPARATOR.join(spans))
+    context = SEPARATOR.join(pack_spans(spans, token_budget_for(model)))
+    context_tokens = estimate_tokens(context)
+
+    report = {
+        "retrieved_tokens": retrieved_tokens,
+        "context_tokens": context_tokens,
+        "saved_overlap": max(retrieved_tokens - merged_tokens, 0),
+        "saved_budget": max(merged_tokens - context_tokens, 0),
+    }
+    CONTEXT_TOKENS_SAVED.labels("overlap").inc(report["saved_overlap"])
+    CONTEXT_TOKENS_SAVED.labels("budget").inc(report["saved_budget"])
+    return context, report
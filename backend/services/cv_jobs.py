@@ -0,0 +1,220 @@
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from config import settings
+from database import SessionLocal
+from models import CV, CVProcessingJob
+from services.cloudinary_service import delete_pdf_from_cloudinary
+from services.rag_service import rag_service
+
+
+class CVSupersededError(Exception):
+    """Raised before storing chunks for a CV that is no longer the user's current one"""
+
+
+def enqueue_cv_job(db: Session, cv: CV) -> CVProcessingJob:
+    """
+    Queue processing for a newly uploaded CV, cancelling any pending jobs for the user's older CVs
+
+    A job for an older CV that is already running cancels itself before its store stage.
+    """
+    db.query(CVProcessingJob).filter(
+        CVProcessingJob.user_id == cv.user_id,
+        CVProcessingJob.status == "queued"
+    ).update({"status": "cancelled", "finished_at": datetime.utcnow()})
+
+    job = CVProcessingJob(
+        cv_id=cv.id,
+        user_id=cv.user_id,
+        pdf_url=cv.cloudinary_url,
+        status="queued",
+        max_attempts=settings.CV_JOB_MAX_ATTEMPTS
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def latest_job_for_cv(db: Session, cv_id: int) -> Optional[CVProcessingJob]:
+    return db.query(CVProcessingJob).filter(
+        CVProcessingJob.cv_id == cv_id
+    ).order_by(CVProcessingJob.id.desc()).first()
+
+
+def claim_next_job(worker_id: str) -> Optional[int]:
+    """Atomically claim the oldest due job, or a running job whose worker stopped reporting progress"""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        stale_before = now - timedelta(seconds=settings.CV_JOB_STALE_AFTER)
+        job = db.query(CVProcessingJob).filter(
+            or_(
+                and_(CVProcessingJob.status == "queued", CVProcessingJob.next_attempt_at <= now),
+                and_(CVProcessingJob.status == "running", CVProcessingJob.updated_at < stale_before)
+            )
+        ).order_by(CVProcessingJob.next_attempt_at).with_for_update(skip_locked=True).first()
+        if job is None:
+            return None
+
+        if job.attempts >= job.max_attempts:
+            # A stale job that already used its last attempt isn't started again
+            job.status = "failed"
+            job.last_error = job.last_error or "Worker stopped reporting progress"
+            job.finished_at = now
+            db.commit()
+            return None
+
+        _start_attempt(job, worker_id)
+        db.commit()
+        return job.id
+    finally:
+        db.close()
+
+
+def claim_job(job_id: int, worker_id: str) -> bool:
+    """Claim one specific queued job (used when running jobs inside the API process)"""
+    db = SessionLocal()
+    try:
+        job = db.query(CVProcessingJob).filter(
+            CVProcessingJob.id == job_id,
+            CVProcessingJob.status == "queued"
+        ).with_for_update(skip_locked=True).first()
+        if job is None:
+            return False
+
+        _start_attempt(job, worker_id)
+        db.commit()
+        return True
+    finally:
+        db.close()
+
+
+def _start_attempt(job: CVProcessingJob, worker_id: str):
+    job.status = "running"
+    job.stage = None
+    job.attempts += 1
+    job.worker_id = worker_id
+    job.updated_at = datetime.utcnow()
+
+
+def _ensure_current_cv(user_id: int, cv_id: int):
+    """Raise CVSupersededError unless cv_id is still the user's latest CV"""
+    db = SessionLocal()
+    try:
+        current = db.query(CV.id).filter(CV.user_id == user_id).order_by(CV.id.desc()).first()
+    finally:
+        db.close()
+    if current is None or current.id != cv_id:
+        raise CVSupersededError(f"CV {cv_id} was replaced before it was stored")
+
+
+def _update_job(job_id: int, **fields):
+    db = SessionLocal()
+    try:
+        db.query(CVProcessingJob).filter(CVProcessingJob.id == job_id).update(
+            {**fields, "updated_at": datetime.utcnow()}
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def run_claimed_job(job_id: int, pdf_bytes: Optional[bytes] = None):
+    """
+    Run one attempt of a claimed job, recording stage progress and scheduling a retry on failure
+
+    pdf_bytes, when the caller still holds the uploaded file, are parsed directly instead of
+    downloading the PDF back from Cloudinary.
+    """
+    db = SessionLocal()
+    try:
+        job = db.query(CVProcessingJob).filter(CVProcessingJob.id == job_id).first()
+        cv = db.query(CV).filter(CV.id == job.cv_id).first()
+        if cv is None:
+            # The CV was deleted or replaced while the job was waiting
+            job.status = "cancelled"
+            job.finished_at = datetime.utcnow()
+            db.commit()
+            return
+        user_id, cv_id, pdf_url = job.user_id, job.cv_id, job.pdf_url
+        attempts, max_attempts = job.attempts, job.max_attempts
+        filename = cv.filename
+    finally:
+        db.close()
+
+    try:
+        stats = rag_service.process_cv(
+            user_id,
+            pdf_url,
+            progress=lambda stage: _update_job(job_id, stage=stage),
+            pdf_bytes=pdf_bytes,
+            source=filename,
+            before_store=lambda: _ensure_current_cv(user_id, cv_id)
+        )
+    except CVSupersededError as e:
+        print(f"CV job {job_id} cancelled: {str(e)}")
+        _update_job(job_id, status="cancelled", last_error=str(e), finished_at=datetime.utcnow())
+        return
+    except Exception as e:
+        print(f"CV job {job_id} attempt {attempts}/{max_attempts} failed: {str(e)}")
+        if attempts >= max_attempts:
+            _update_job(job_id, status="failed", last_error=str(e), finished_at=datetime.utcnow())
+        else:
+            backoff = settings.CV_JOB_RETRY_BACKOFF * 2 ** (attempts - 1)
+            _update_job(
+                job_id,
+                status="queued",
+                last_error=str(e),
+                next_attempt_at=datetime.utcnow() + timedelta(seconds=backoff)
+            )
+        return
+
+    db = SessionLocal()
+    try:
+        job = db.query(CVProcessingJob).filter(CVProcessingJob.id == job_id).first()
+        job.status = "succeeded"
+        job.result = stats
+        job.last_error = None
+        job.finished_at = datetime.utcnow()
+        cv = db.query(CV).filter(CV.id == job.cv_id).first()
+        if cv:
+            cv.processed = True
+        db.commit()
+
+        # Delete PDF from Cloudinary after successful processing
+        if cv:
+            try:
+                delete_pdf_from_cloudinary(cv.cloudinary_public_id)
+                print(f"Deleted PDF from Cloudinary for user {user_id}")
+            except Exception as e:
+                print(f"Warning: Could not delete PDF from Cloudinary: {str(e)}")
+    finally:
+        db.close()
+
+
+def run_job_in_process(job_id: int, pdf_bytes: Optional[bytes] = None):
+    """
+    Run one attempt of a job inside the API process, scheduling the next one if it fails
+
+    The retry waits on a timer thread rather than sleeping here, so a failing job doesn't hold
+    a threadpool worker that requests need for the whole backoff.
+    """
+    if not claim_job(job_id, f"api:{job_id}"):
+        return
+    run_claimed_job(job_id, pdf_bytes)
+
+    db = SessionLocal()
+    try:
+        job = db.query(CVProcessingJob).filter(CVProcessingJob.id == job_id).first()
+        if job.status != "queued":
+            return
+        wait = (job.next_attempt_at - datetime.utcnow()).total_seconds()
+    finally:
+        db.close()
+
+    retry = threading.Timer(max(0.0, wait), run_job_in_process, args=(job_id, pdf_bytes))
+    retry.daemon = True
+    retry.start()
@@ -0,0 +1,91 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, List, Tuple
+import numpy as np
+
+
+class CVMatrix:
+    """A CV's chunk embeddings as one row-normalized float32 matrix, alongside the chunk texts"""
+    def __init__(self, texts: List[str], embeddings):
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2:
+            matrix = matrix.reshape(len(texts), -1) if len(texts) else np.zeros((0, 1), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.matrix = np.ascontiguousarray(matrix / norms)
+        self.texts = texts
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes + sum(len(text) for text in self.texts)
+
+    def top_k(self, embedding: List[float], k: int) -> List[Tuple[str, float]]:
+        """The k chunks closest to embedding by cosine similarity, best first"""
+        if not self.texts:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        scores = self.matrix @ (query / norm if norm else query)
+        if k < len(scores):
+            candidates = np.argpartition(-scores, k)[:k]
+        else:
+            candidates = np.arange(len(scores))
+        ranked = candidates[np.argsort(-scores[candidates])]
+        return [(self.texts[i], float(scores[i])) for i in ranked]
+
+
+class CVMatrixCache:
+    """
+    Thread-safe LRU of CV matrices keyed by (user_id, cv_version), bounded by total bytes
+
+    Each upload creates a new CV row, so a key never refers to stale chunks; invalidate() only
+    frees the memory of versions that won't be asked for again.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._bytes = 0
+        self._data: "OrderedDict[Hashable, CVMatrix]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, load: Callable[[], CVMatrix]) -> CVMatrix:
+        """Return the cached matrix for key, building it with load() on a miss"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # Load outside the lock so one user's database read doesn't block everyone else's search
+        entry = load()
+        if entry.nbytes > self.max_bytes:
+            return entry
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            self._data[key] = entry
+            self._bytes += entry.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= evicted.nbytes
+        return entry
+
+    def invalidate(self, user_id: int):
+        """Drop every cached matrix for a user"""
+        with self._lock:
+            for key in [key for key in self._data if key[0] == user_id]:
+                self._bytes -= self._data.pop(key).nbytes
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
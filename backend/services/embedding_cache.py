@@ -0,0 +1,66 @@
+import hashlib
+from sqlalchemy.dialects.postgresql import insert
+from langchain_core.embeddings import Embeddings
+from database import SessionLocal
+from models import EmbeddingCache
+
+
+def content_hash(text: str) -> str:
+    """Stable content address for a chunk of text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only calls the backend for chunks not already in the embedding_cache table"""
+    def __init__(self, embeddings: Embeddings, model_name: str):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.reused = 0
+        self.embedded = 0
+
+    def embed_documents(self, texts: list) -> list:
+        """Embed multiple texts, reusing stored vectors for previously seen content"""
+        if not texts:
+            return []
+        
+        hashes = [content_hash(text) for text in texts]
+        db = SessionLocal()
+        try:
+            rows = db.query(EmbeddingCache.content_hash, EmbeddingCache.embedding).filter(
+                EmbeddingCache.model == self.model_name,
+                EmbeddingCache.content_hash.in_(set(hashes))
+            ).all()
+        finally:
+            # Released before the embedding call, which can take seconds
+            db.close()
+        vectors = {row_hash: [float(x) for x in embedding] for row_hash, embedding in rows}
+        
+        # Unseen chunks, deduplicated so repeated text is only embedded once
+        missing = {}
+        for text_hash, text in zip(hashes, texts):
+            if text_hash not in vectors and text_hash not in missing:
+                missing[text_hash] = text
+        
+        if missing:
+            new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            new_entries = dict(zip(missing.keys(), new_vectors))
+            db = SessionLocal()
+            try:
+                db.execute(
+                    insert(EmbeddingCache).values([
+                        {"content_hash": text_hash, "model": self.model_name, "embedding": vector}
+                        for text_hash, vector in new_entries.items()
+                    ]).on_conflict_do_nothing()
+                )
+                db.commit()
+            finally:
+                db.close()
+            vectors.update(new_entries)
+        
+        self.embedded += len(missing)
+        self.reused += len(texts) - len(missing)
+        return [vectors[text_hash] for text_hash in hashes]
+
+    def embed_query(self, text: str) -> list:
+        """Queries are cached in-process by the wrapped backend"""
+        return self.embeddings.embed_query(text)
@@ -0,0 +1,87 @@
+import json
+from typing import AsyncIterator, Optional
+import httpx
+from config import settings
+from services.metrics import UPSTREAM_ERRORS, record_llm_usage, timed
+
+class AsyncLLMClient:
+    """Async chat-completions client sharing one keep-alive connection pool across requests"""
+    def __init__(self, api_key: str, api_url: str, max_connections: int = 200, timeout: float = 120.0):
+        self.api_key = api_key
+        self.api_url = api_url
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created lazily so it binds to the running event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ),
+                timeout=httpx.Timeout(self.timeout, connect=10.0)
+            )
+        return self._client
+
+    async def chat_completion(self, data: dict) -> dict:
+        """Send a chat-completions request and return the parsed JSON response"""
+        try:
+            with timed("llm"):
+                response = await self.client.post(self.api_url, json=data)
+        except httpx.HTTPError:
+            UPSTREAM_ERRORS.labels("llm").inc()
+            raise
+        if response.status_code != 200:
+            UPSTREAM_ERRORS.labels("llm").inc()
+            raise Exception(f"DeepSeek API error: {response.status_code} {response.text}")
+        result = response.json()
+        record_llm_usage(result)
+        return result
+
+    async def stream_chat_completion(self, data: dict) -> AsyncIterator[str]:
+        """Send a chat-completions request with stream=true and yield content deltas as they arrive"""
+        try:
+            with timed("llm"):
+                async with self.client.stream("POST", self.api_url, json={**data, "stream": True}) as response:
+                    if response.status_code != 200:
+                        UPSTREAM_ERRORS.labels("llm").inc()
+                        body = (await response.aread()).decode("utf-8", errors="replace")
+                        raise Exception(f"DeepSeek API error: {response.status_code} {body}")
+
+                    async for line in response.aiter_lines():
+                        # Server-sent events: "data: {json}" lines, terminated by "data: [DONE]"
+                        line = line.strip()
+                        if not line.startswith("data:"):
+                            continue
+                        payload = line[len("data:"):].strip()
+                        if payload == "[DONE]":
+                            break
+
+                        chunk = json.loads(payload)
+                        # Some providers report usage on the final chunk
+                        record_llm_usage(chunk)
+                        choices = chunk.get("choices") or []
+                        if choices:
+                            delta = (choices[0].get("delta") or {}).get("content")
+                            if delta:
+                                yield delta
+        except httpx.HTTPError:
+            UPSTREAM_ERRORS.labels("llm").inc()
+            raise
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+llm_client = AsyncLLMClient(
+    api_key=settings.HUGGINGFACE_API_KEY,
+    api_url=settings.LLM_API_URL,
+    max_connections=settings.LLM_MAX_CONNECTIONS,
+    timeout=settings.LLM_TIMEOUT
+)
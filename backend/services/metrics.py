@@ -0,0 +1,109 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+
+STAGE_LATENCY = Histogram(
+    "rag_stage_duration_seconds",
+    "Time spent in each RAG pipeline stage",
+    ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+
+UPSTREAM_ERRORS = Counter(
+    "rag_upstream_errors_total",
+    "Failed calls to external services",
+    ["service"]
+)
+
+LLM_TOKENS = Counter(
+    "rag_llm_tokens_total",
+    "Tokens reported by the LLM API",
+    ["kind"]
+)
+
+CONTEXT_TOKENS_SAVED = Counter(
+    "rag_context_tokens_saved_total",
+    "Estimated prompt tokens removed from retrieved context",
+    ["reason"]
+)
+
+# Stage durations for the current request, rendered into its Server-Timing header
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def start_request_timings() -> Dict[str, float]:
+    """Begin collecting stage timings for the current request"""
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def record_stage(stage: str, seconds: float):
+    """Observe a stage duration, and add it to the current request's timings if there is one"""
+    STAGE_LATENCY.labels(stage).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def record_llm_usage(result: dict):
+    """Count the tokens reported in a chat-completions response (or final stream chunk)"""
+    usage = result.get("usage") or {}
+    for kind in ("prompt_tokens", "completion_tokens"):
+        if usage.get(kind):
+            LLM_TOKENS.labels(kind.replace("_tokens", "")).inc(usage[kind])
+
+
+def server_timing_header(timings: Dict[str, float], total: float) -> str:
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class CacheStatsCollector:
+    """Exposes the hit/miss/size counters that the in-process caches already keep"""
+    def __init__(self):
+        self.sources: Dict[str, Callable[[], dict]] = {}
+
+    def register(self, name: str, stats: Callable[[], dict]):
+        self.sources[name] = stats
+
+    def collect(self):
+        hits = CounterMetricFamily("rag_cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("rag_cache_misses", "Cache misses", labels=["cache"])
+        entries = GaugeMetricFamily("rag_cache_entries", "Entries currently cached", labels=["cache"])
+        for name, stats in self.sources.items():
+            values = stats()
+            if "hits" in values:
+                hits.add_metric([name], values["hits"])
+            if "misses" in values:
+                misses.add_metric([name], values["misses"])
+            size = values.get("size", values.get("users"))
+            if size is not None:
+                entries.add_metric([name], size)
+        yield hits
+        yield misses
+        yield entries
+
+
+cache_stats = CacheStatsCollector()
+REGISTRY.register(cache_stats)
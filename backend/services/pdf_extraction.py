@@ -0,0 +1,93 @@
+import io
+import math
+import multiprocessing
+import threading
+import time
+from typing import List, Optional
+import pypdf
+from langchain_core.documents import Document
+from config import settings
+
+_pool = None
+# One large document on the pool at a time, so a timeout can replace the pool without
+# killing ranges that belong to another upload
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    """The shared extraction pool; only called while holding _pool_lock"""
+    global _pool
+    if _pool is None:
+        # spawn rather than fork: the API process is multi-threaded and holds DB connections
+        context = multiprocessing.get_context("spawn")
+        _pool = context.Pool(processes=settings.PDF_EXTRACTION_WORKERS)
+    return _pool
+
+
+def _replace_pool():
+    """Kill the worker processes so a pathological document can't keep holding them"""
+    global _pool
+    if _pool is not None:
+        _pool.terminate()
+        _pool = None
+
+
+def _extract_page_range(pdf_bytes: bytes, start: int, end: int, deadline: Optional[float] = None) -> List[str]:
+    """Extract the text of pages [start, end); runs in-process or in a pool worker process"""
+    reader = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+    texts = []
+    for page_number in range(start, end):
+        if deadline is not None and time.time() > deadline:
+            raise TimeoutError(f"PDF text extraction exceeded {settings.PDF_EXTRACTION_TIMEOUT}s")
+        texts.append(reader.pages[page_number].extract_text())
+    return texts
+
+
+def _extract_on_pool(pdf_bytes: bytes, page_count: int, deadline: float) -> List[str]:
+    # A few ranges per worker so one slow range doesn't leave the others idle
+    range_size = max(1, math.ceil(page_count / (settings.PDF_EXTRACTION_WORKERS * 2)))
+    if not _pool_lock.acquire(timeout=max(0.0, deadline - time.time())):
+        raise TimeoutError(f"PDF text extraction exceeded {settings.PDF_EXTRACTION_TIMEOUT}s waiting for a worker")
+    try:
+        pool = _get_pool()
+        results = [
+            pool.apply_async(_extract_page_range, (pdf_bytes, start, min(start + range_size, page_count), deadline))
+            for start in range(0, page_count, range_size)
+        ]
+        texts = []
+        try:
+            for result in results:
+                texts.extend(result.get(timeout=max(0.0, deadline - time.time())))
+        except multiprocessing.TimeoutError:
+            _replace_pool()
+            raise TimeoutError(
+                f"PDF text extraction exceeded {settings.PDF_EXTRACTION_TIMEOUT}s ({page_count} pages)"
+            )
+        return texts
+    finally:
+        _pool_lock.release()
+
+
+def extract_pdf_pages(pdf_bytes: bytes, source: str) -> List[Document]:
+    """
+    Extract one Document per page, with the same text and metadata PyPDFParser produces
+
+    PDFs under PDF_PARALLEL_PAGE_THRESHOLD pages (most CVs) are extracted in-process, checking
+    the PDF_EXTRACTION_TIMEOUT deadline between pages. Larger ones are split into page ranges on
+    a shared pool of PDF_EXTRACTION_WORKERS processes, one document at a time, and a document
+    that runs past the deadline has its workers killed. Documents over PDF_MAX_PAGES are rejected.
+    """
+    deadline = time.time() + settings.PDF_EXTRACTION_TIMEOUT
+    page_count = len(pypdf.PdfReader(io.BytesIO(pdf_bytes)).pages)
+    if page_count > settings.PDF_MAX_PAGES:
+        raise Exception(f"PDF has {page_count} pages; the limit is {settings.PDF_MAX_PAGES}")
+
+    if settings.PDF_EXTRACTION_WORKERS <= 1 or page_count < settings.PDF_PARALLEL_PAGE_THRESHOLD:
+        texts = _extract_page_range(pdf_bytes, 0, page_count, deadline)
+    else:
+        texts = _extract_on_pool(pdf_bytes, page_count, deadline)
+
+    return [
+        Document(page_content=text, metadata={"source": source, "page": page_number})
+        for page_number, text in enumerate(texts)
+    ]
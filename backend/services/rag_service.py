@@ -1,43 +1,253 @@
-import os
 import re
+import time
+import asyncio
+import threading
 import requests
-from langchain_community.document_loaders import PyPDFLoader
+from contextlib import contextmanager
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from sqlalchemy import text as sql_text
+from sqlalchemy.exc import ProgrammingError
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import PGVector
 from langchain_core.embeddings import Embeddings
 from config import settings
+from database import engine
+from services.context_assembly import assemble_context
+from services.cv_matrix_cache import CVMatrix, CVMatrixCache
+from services.application_cache import find_cached_application, application_cache_stats
+from services.embedding_cache import CachedEmbeddings
+from services.llm_client import llm_client
+from services.metrics import UPSTREAM_ERRORS, cache_stats, record_stage, timed
+from services.pdf_extraction import extract_pdf_pages
+from services.semantic_cache import SemanticAnswerCache
+from services.streaming import IncrementalMarkdownConverter, EmailStreamParser
+from services.vector_store import UserVectorStore, VectorStoreRegistry, chunk_ids_for, collection_name_for
+from utils.cache import TTLCache
+from utils.single_flight import SingleFlight
+
+CHAT_MODEL = "meta-llama/Llama-3.2-3B-Instruct"
+APPLICATION_MODEL = "deepseek-ai/DeepSeek-V3.2"
+APPLICATION_TYPES = ("cover_letter", "email")
+
+
+def _embed_queries_cached(model: Embeddings, texts: list, encode: Callable[[list], list]) -> list:
+    """Embed query texts through model's query cache, encoding every miss in one call"""
+    keys = [(model.model_id, " ".join(text.split()).lower()) for text in texts]
+    vectors = {}
+    missing = {}
+    for key, text in zip(keys, texts):
+        cached = model.query_cache.get(key)
+        if cached is not None:
+            vectors[key] = list(cached)
+        elif key not in missing:
+            missing[key] = text
+    
+    if missing:
+        with timed("embed_query"):
+            embeddings = encode(list(missing.values()))
+        for key, embedding in zip(missing, embeddings):
+            model.query_cache.set(key, tuple(embedding))
+            vectors[key] = embedding
+    return [vectors[key] for key in keys]
 
 
 class HuggingFaceAPIEmbeddings(Embeddings):
     """Custom embeddings using HuggingFace API - lightweight, no model downloads"""
-    def __init__(self, api_key: str):
+    def __init__(
+        self,
+        api_key: str,
+        api_url: str = "https://router.huggingface.co/hf-inference/models/{model_id}/pipeline/feature-extraction",
+        batch_size: int = 32,
+        max_concurrency: int = 4,
+        query_cache_size: int = 1024,
+        query_cache_ttl: int = 600,
+        timeout: Tuple[float, float] = (5.0, 60.0)
+    ):
         self.api_key = api_key
-        self.api_url = "https://router.huggingface.co/hf-inference/models/sentence-transformers/all-mpnet-base-v2/pipeline/feature-extraction"
+        self.timeout = timeout  # (connect, read) seconds, so a hung call can't hold an executor worker
+        self.model_id = "sentence-transformers/all-mpnet-base-v2"
+        self.dimension = 768
+        self.api_url = api_url.format(model_id=self.model_id)
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        
+        # One keep-alive session shared by all batches, sized for the concurrency limit
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"Bearer {self.api_key}"})
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=self.max_concurrency))
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=self.max_concurrency))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix="embedding"
+        )
+        self.query_cache = TTLCache(maxsize=query_cache_size, ttl=query_cache_ttl)
     
     def embed_documents(self, texts: list) -> list:
-        """Embed multiple texts"""
-        headers = {"Authorization": f"Bearer {self.api_key}"}
-        embeddings = []
-        
-        for text in texts:
-            response = requests.post(self.api_url, headers=headers, json={"inputs": text})
-            if response.status_code == 200:
-                embedding = response.json()
-                embeddings.append(embedding)
-            else:
-                raise Exception(f"Embedding API error: {response.status_code} - {response.text}")
+        """Embed multiple texts in batches, keeping at most max_concurrency batches in flight"""
+        if not texts:
+            return []
+        
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        start = time.perf_counter()
+        # map() preserves batch order, so vectors line up with the input texts
+        results = list(self._executor.map(self._embed_batch, batches))
+        elapsed = time.perf_counter() - start
+        record_stage("embedding", elapsed)
+        print(f"Embedded {len(texts)} texts in {len(batches)} batches ({elapsed:.2f}s)")
         
+        return [embedding for batch in results for embedding in batch]
+    
+    def _post(self, payload: dict) -> requests.Response:
+        """POST to the feature-extraction API, counting timeouts and connection failures as upstream errors"""
+        try:
+            return self.session.post(self.api_url, json=payload, timeout=self.timeout)
+        except requests.Timeout:
+            UPSTREAM_ERRORS.labels("embedding").inc()
+            raise Exception(f"Embedding API error: timed out after {self.timeout} seconds (connect, read)")
+        except requests.RequestException:
+            UPSTREAM_ERRORS.labels("embedding").inc()
+            raise
+    
+    def _embed_batch(self, batch: list) -> list:
+        """Embed one batch of texts with a single feature-extraction call"""
+        start = time.perf_counter()
+        response = self._post({"inputs": batch})
+        if response.status_code != 200:
+            UPSTREAM_ERRORS.labels("embedding").inc()
+            raise Exception(f"Embedding API error: {response.status_code} - {response.text}")
+        
+        embeddings = response.json()
+        if len(embeddings) != len(batch):
+            raise Exception(f"Embedding API error: expected {len(batch)} vectors, got {len(embeddings)}")
+        
+        elapsed = time.perf_counter() - start
+        print(f"Embedding batch of {len(batch)} texts took {elapsed * 1000:.0f}ms")
         return embeddings
     
     def embed_query(self, text: str) -> list:
-        """Embed a single query text"""
-        headers = {"Authorization": f"Bearer {self.api_key}"}
-        response = requests.post(self.api_url, headers=headers, json={"inputs": text})
+        """Embed a single query text, reusing recent results for the same normalized text"""
+        cache_key = (self.model_id, " ".join(text.split()).lower())
+        cached = self.query_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+        
+        with timed("embed_query"):
+            response = self._post({"inputs": text})
         
         if response.status_code == 200:
-            return response.json()
+            embedding = response.json()
+            self.query_cache.set(cache_key, tuple(embedding))
+            return embedding
         else:
+            UPSTREAM_ERRORS.labels("embedding").inc()
             raise Exception(f"Embedding API error: {response.status_code} - {response.text}")
+    
+    def embed_queries(self, texts: list) -> list:
+        """Embed several query texts, sending the uncached ones in batched API calls"""
+        def encode(batch_texts: list) -> list:
+            batches = [batch_texts[i:i + self.batch_size] for i in range(0, len(batch_texts), self.batch_size)]
+            return [embedding for batch in self._executor.map(self._embed_batch, batches) for embedding in batch]
+        return _embed_queries_cached(self, texts, encode)
+
+
+class LocalCPUEmbeddings(Embeddings):
+    """
+    Sentence-transformers embeddings computed in-process on the CPU - no network calls
+
+    Requires the optional sentence-transformers package. Inference runs in batches of batch_size
+    on at most num_threads torch threads, one encode call at a time so concurrent requests don't
+    oversubscribe the CPU.
+    """
+    def __init__(
+        self,
+        model_id: str = "sentence-transformers/all-mpnet-base-v2",
+        batch_size: int = 32,
+        num_threads: int = 2,
+        query_cache_size: int = 1024,
+        query_cache_ttl: int = 600
+    ):
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise Exception(
+                "EMBEDDING_BACKEND=local requires the sentence-transformers package: "
+                "pip install sentence-transformers"
+            )
+        
+        torch.set_num_threads(max(1, num_threads))
+        self.model_id = model_id
+        self.model = SentenceTransformer(model_id, device="cpu")
+        self.dimension = self.model.get_sentence_embedding_dimension()
+        self.batch_size = max(1, batch_size)
+        self._lock = threading.Lock()
+        self.query_cache = TTLCache(maxsize=query_cache_size, ttl=query_cache_ttl)
+    
+    def _encode(self, texts: list) -> list:
+        with self._lock:
+            vectors = self.model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True)
+        return vectors.tolist()
+    
+    def embed_documents(self, texts: list) -> list:
+        """Embed multiple texts in batches on the local model"""
+        if not texts:
+            return []
+        
+        start = time.perf_counter()
+        embeddings = self._encode(texts)
+        elapsed = time.perf_counter() - start
+        record_stage("embedding", elapsed)
+        print(f"Embedded {len(texts)} texts locally ({elapsed:.2f}s)")
+        return embeddings
+    
+    def embed_query(self, text: str) -> list:
+        """Embed a single query text, reusing recent results for the same normalized text"""
+        cache_key = (self.model_id, " ".join(text.split()).lower())
+        cached = self.query_cache.get(cache_key)
+        if cached is not None:
+            return list(cached)
+        
+        with timed("embed_query"):
+            embedding = self._encode([text])[0]
+        self.query_cache.set(cache_key, tuple(embedding))
+        return embedding
+    
+    def embed_queries(self, texts: list) -> list:
+        """Embed several query texts, encoding the uncached ones in one batch"""
+        return _embed_queries_cached(self, texts, self._encode)
+
+
+def create_embedding_model() -> Embeddings:
+    """Build the embedding backend selected by EMBEDDING_BACKEND ("api" or "local")"""
+    if settings.EMBEDDING_BACKEND == "local":
+        model = LocalCPUEmbeddings(
+            model_id=settings.LOCAL_EMBEDDING_MODEL,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            num_threads=settings.LOCAL_EMBEDDING_THREADS,
+            query_cache_size=settings.QUERY_EMBEDDING_CACHE_SIZE,
+            query_cache_ttl=settings.QUERY_EMBEDDING_CACHE_TTL
+        )
+    elif settings.EMBEDDING_BACKEND == "api":
+        model = HuggingFaceAPIEmbeddings(
+            api_key=settings.HUGGINGFACE_API_KEY,
+            api_url=settings.EMBEDDING_API_URL,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            max_concurrency=settings.EMBEDDING_MAX_CONCURRENCY,
+            query_cache_size=settings.QUERY_EMBEDDING_CACHE_SIZE,
+            query_cache_ttl=settings.QUERY_EMBEDDING_CACHE_TTL,
+            timeout=(settings.EMBEDDING_CONNECT_TIMEOUT, settings.EMBEDDING_READ_TIMEOUT)
+        )
+    else:
+        raise Exception(f"Unknown EMBEDDING_BACKEND: {settings.EMBEDDING_BACKEND}")
+    
+    if model.dimension != settings.EMBEDDING_DIMENSION:
+        raise Exception(
+            f"Embedding model {model.model_id} produces {model.dimension}-dimensional vectors, "
+            f"but EMBEDDING_DIMENSION is {settings.EMBEDDING_DIMENSION}"
+        )
+    return model
 
 
 class RAGService:
@@ -50,10 +260,43 @@ class RAGService:
         self._initialize_models()
 
     def _initialize_models(self):
-        """Use API-based embeddings instead of local models"""
-        self.embedding_model = HuggingFaceAPIEmbeddings(
-            api_key=settings.HUGGINGFACE_API_KEY
+        """API-based embeddings by default; a local CPU model when EMBEDDING_BACKEND=local"""
+        self.embedding_model = create_embedding_model()
+        self.vector_stores = VectorStoreRegistry(
+            self.embedding_model,
+            maxsize=settings.VECTOR_STORE_CACHE_SIZE
         )
+        self.answer_cache = SemanticAnswerCache(
+            threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+            max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+            max_users=settings.SEMANTIC_CACHE_MAX_USERS,
+            ttl=settings.SEMANTIC_CACHE_TTL
+        )
+        # Concurrent identical requests (double-clicks, client retries) share one upstream call
+        self.in_flight = SingleFlight()
+        self.cv_matrices = CVMatrixCache(max_bytes=settings.CV_MATRIX_CACHE_MAX_MB * 1024 * 1024)
+        cache_stats.register("query_embedding", self.embedding_model.query_cache.stats)
+        cache_stats.register("semantic_answer", self.answer_cache.stats)
+        cache_stats.register("vector_store", self.vector_stores.stats)
+        cache_stats.register("application", application_cache_stats)
+        cache_stats.register("cv_matrix", self.cv_matrices.stats)
+        cache_stats.register("single_flight", self.in_flight.stats)
+
+    def verify_embedding_dimension(self):
+        """Refuse to start if stored CV vectors don't match the embedding backend's dimension"""
+        try:
+            with engine.connect() as connection:
+                stored = connection.execute(
+                    sql_text("SELECT vector_dims(embedding) FROM langchain_pg_embedding LIMIT 1")
+                ).scalar()
+        except ProgrammingError:
+            # No collections have been created yet
+            return
+        if stored is not None and stored != self.embedding_model.dimension:
+            raise Exception(
+                f"Stored CV embeddings have {stored} dimensions but {self.embedding_model.model_id} "
+                f"produces {self.embedding_model.dimension}; re-index CVs or switch EMBEDDING_BACKEND"
+            )
 
     def _markdown_to_html(self, text: str) -> str:
         """Convert markdown formatting to HTML"""
@@ -70,15 +313,10 @@ class RAGService:
         
         return text
 
-    def _call_deepseek(self, context: str, question: str) -> str:
-        """Call DeepSeek API for answering questions about CV content (used in chat)"""
-        API_URL = "https://router.huggingface.co/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {settings.HUGGINGFACE_API_KEY}",
-            "Content-Type": "application/json",
-        }
+    def _chat_request(self, context: str, question: str) -> dict:
+        """Build the chat-completions payload for answering questions about CV content"""
         data = {
-    "model": "meta-llama/Llama-3.2-3B-Instruct",
+    "model": CHAT_MODEL,
     "messages": [
         {
             "role": "system",
@@ -121,111 +359,575 @@ class RAGService:
     "temperature": 0.35,
     "top_p": 0.9
 }
+        return data
 
-        response = requests.post(API_URL, headers=headers, json=data)
-        if response.status_code == 200:
-            result = response.json()
-            # Extract the answer from the response
-            try:
-                return result["choices"][0]["message"]["content"]
-            except Exception:
-                return str(result)
-        else:
-            return f"DeepSeek API error: {response.status_code} {response.text}"
+    def _chat_answer(self, result: dict) -> str:
+        """Extract the answer from a chat-completions response"""
+        try:
+            return result["choices"][0]["message"]["content"]
+        except Exception:
+            return str(result)
 
-    def process_cv(self, user_id: int, pdf_url: str):
-        temp_pdf_path = f"temp_{user_id}.pdf"
+    def _retrieve_context(
+        self,
+        user_id: int,
+        query: str,
+        k: int,
+        cv_version: Optional[int] = None,
+        model: Optional[str] = None,
+        embedding: Optional[list] = None
+    ) -> str:
+        """
+        Retrieve the k most relevant CV chunks for a query, assembled into model's context budget
+        
+        embedding is the query's embedding when the caller already has it (batched requests).
+        """
+        with timed("retrieval"):
+            vectorstore = self.vector_stores.get(user_id, cv_version)
+            # Embedding (HF) and search (Postgres or in-process) are timed separately within retrieval
+            if embedding is None:
+                embedding = self.embedding_model.embed_query(query)
+            # A CV is only a few dozen chunks, so once its matrix is cached a dot product replaces
+            # the database round trip. Without a CV version there is no safe cache key.
+            if settings.RETRIEVAL_MODE == "memory" and cv_version is not None:
+                matrix = self.cv_matrices.get((user_id, cv_version), lambda: self._load_cv_matrix(vectorstore))
+                with timed("vector_search"):
+                    texts = [text for text, _ in matrix.top_k(embedding, k)]
+            else:
+                with timed("vector_search"):
+                    texts = [d.page_content for d in vectorstore.similarity_search_by_vector(embedding, k=k)]
+        with timed("context_assembly"):
+            context, _ = assemble_context(texts, model)
+        return context
+
+    def _load_cv_matrix(self, vectorstore: UserVectorStore) -> CVMatrix:
+        with timed("cv_matrix_load"):
+            texts, embeddings = vectorstore.load_chunks()
+            return CVMatrix(texts, embeddings)
+
+    def _load_pdf(self, pdf_bytes: bytes, source: str) -> list:
+        """Parse a PDF held in memory into one Document per page, without touching disk"""
+        return extract_pdf_pages(pdf_bytes, source)
+
+    def process_cv(
+        self,
+        user_id: int,
+        pdf_url: Optional[str] = None,
+        progress: Optional[Callable[[str], None]] = None,
+        pdf_bytes: Optional[bytes] = None,
+        source: Optional[str] = None,
+        before_store: Optional[Callable[[], None]] = None
+    ):
+        """
+        Parse, split, embed and store a user's CV, replacing their collection
+        
+        The PDF is parsed in memory from pdf_bytes when the caller already has them (straight from
+        the upload); otherwise it is downloaded from pdf_url first. progress, if given, is called
+        with each stage name (download, parse, split, embed, store) as the stage starts.
+        
+        With CV_INCREMENTAL_INDEXING the stored collection is diffed against the new chunks by
+        stable chunk id: only removed chunks are deleted and only new ones embedded and inserted.
+        
+        The store stage holds a per-user lock, so two runs for the same user never write the
+        collection at once. before_store, if given, is called holding that lock and can raise to
+        abandon the run (e.g. when the CV has been replaced in the meantime).
+        """
+        report = progress or (lambda stage: None)
         try:
-            response = requests.get(pdf_url)
-            response.raise_for_status()
-            with open(temp_pdf_path, "wb") as f:
-                f.write(response.content)
+            report("download")
+            if pdf_bytes is None:
+                response = requests.get(pdf_url)
+                response.raise_for_status()
+                pdf_bytes = response.content
             
-            loader = PyPDFLoader(temp_pdf_path)
-            docs = loader.load()
-            splits = self.text_splitter.split_documents(docs)
+            report("parse")
+            with timed("pdf_parse"):
+                docs = self._load_pdf(pdf_bytes, source or pdf_url or f"user_{user_id}_cv.pdf")
             
-            PGVector.from_documents(
-                documents=splits,
-                embedding=self.embedding_model,
-                connection_string=settings.DATABASE_URL,
-                collection_name=f"user_{user_id}_cv",
-                pre_delete_collection=True
-            )
-            return True
+            report("split")
+            with timed("split"):
+                splits = self.text_splitter.split_documents(docs)
+            
+            embeddings = CachedEmbeddings(self.embedding_model, self.embedding_model.model_id)
+            check = before_store or (lambda: None)
+            if settings.CV_INCREMENTAL_INDEXING:
+                diff = self._reindex_incremental(user_id, splits, embeddings, report, check)
+            else:
+                diff = self._reindex_full(user_id, splits, embeddings, report, check)
+            
+            self.vector_stores.invalidate(user_id)
+            self.cv_matrices.invalidate(user_id)
+            self.answer_cache.invalidate(user_id)
+            stats = {
+                "chunks": len(splits),
+                **diff,
+                "reused": embeddings.reused,
+                "embedded": embeddings.embedded
+            }
+            print(f"Processed CV for user {user_id}: {stats['chunks']} chunks "
+                  f"(+{stats['added']} -{stats['removed']} ={stats['unchanged']}), "
+                  f"{stats['reused']} reused, {stats['embedded']} newly embedded")
+            return stats
         except Exception as e:
             print(f"Error processing CV: {str(e)}")
             raise e
-        finally:
-            if os.path.exists(temp_pdf_path):
-                os.remove(temp_pdf_path)
-    
 
-    def query_cv(self, user_id: int, question: str) -> str:
+    @contextmanager
+    def _store_lock(self, user_id: int):
+        """Hold a transaction-scoped Postgres advisory lock on the user's collection"""
+        with engine.connect() as connection:
+            with connection.begin():
+                connection.execute(
+                    sql_text("SELECT pg_advisory_xact_lock(hashtext('cv_store'), :user_id)"),
+                    {"user_id": user_id}
+                )
+                yield
+
+    def _reindex_full(self, user_id: int, splits: list, embeddings: CachedEmbeddings, report, check) -> dict:
+        """Drop the user's collection and store every chunk again"""
+        texts = [d.page_content for d in splits]
+        
+        # Only chunks never embedded before with this model hit the embedding API
+        report("embed")
+        vectors = embeddings.embed_documents(texts)
+        
+        report("store")
+        with self._store_lock(user_id):
+            check()
+            removed = len(self._indexing_store(user_id, embeddings).stored_chunk_ids())
+            with timed("vector_store_write"):
+                PGVector.from_embeddings(
+                    text_embeddings=list(zip(texts, vectors)),
+                    embedding=embeddings,
+                    metadatas=[d.metadata for d in splits],
+                    connection_string=settings.DATABASE_URL,
+                    collection_name=collection_name_for(user_id),
+                    pre_delete_collection=True,
+                    connection=engine
+                )
+        return {"added": len(splits), "removed": removed, "unchanged": 0}
+
+    def _indexing_store(self, user_id: int, embeddings: Embeddings) -> UserVectorStore:
+        """A fresh handle on the user's collection (created if missing) for re-indexing"""
+        return UserVectorStore(
+            connection_string=settings.DATABASE_URL,
+            embedding_function=embeddings,
+            collection_name=collection_name_for(user_id),
+            connection=engine,
+            create_extension=False
+        )
+
+    def _embed_chunks(self, embeddings: CachedEmbeddings, chunks: list) -> dict:
+        """Embeddings of (chunk_id, document) pairs, keyed by chunk id"""
+        if not chunks:
+            return {}
+        vectors = embeddings.embed_documents([d.page_content for _, d in chunks])
+        return dict(zip([chunk_id for chunk_id, _ in chunks], vectors))
+
+    def _reindex_incremental(self, user_id: int, splits: list, embeddings: CachedEmbeddings, report, check) -> dict:
+        """Diff the new chunks against the stored collection and apply only the changes"""
+        ids = chunk_ids_for(splits, self.embedding_model.model_id)
+        stored_ids = self._indexing_store(user_id, embeddings).stored_chunk_ids()
+        
+        # Embed outside the lock; the diff is recomputed under it in case another run wrote meanwhile
+        report("embed")
+        vectors = self._embed_chunks(
+            embeddings, [(chunk_id, d) for chunk_id, d in zip(ids, splits) if chunk_id not in stored_ids]
+        )
+        
+        report("store")
+        with self._store_lock(user_id):
+            check()
+            store = self._indexing_store(user_id, embeddings)
+            stored = store.stored_chunk_metadata()
+            removed_ids = list(set(stored) - set(ids))
+            new_chunks = [(chunk_id, d) for chunk_id, d in zip(ids, splits) if chunk_id not in stored]
+            # Kept chunks whose metadata changed, e.g. the source filename of a renamed upload
+            refreshed = {
+                chunk_id: d.metadata for chunk_id, d in zip(ids, splits)
+                if chunk_id in stored and stored[chunk_id] != d.metadata
+            }
+            missing = [(chunk_id, d) for chunk_id, d in new_chunks if chunk_id not in vectors]
+            if missing:
+                vectors.update(self._embed_chunks(embeddings, missing))
+            if removed_ids or new_chunks or refreshed:
+                with timed("vector_store_write"):
+                    store.apply_chunk_diff(
+                        removed_ids,
+                        [d.page_content for _, d in new_chunks],
+                        [vectors[chunk_id] for chunk_id, _ in new_chunks],
+                        [d.metadata for _, d in new_chunks],
+                        [chunk_id for chunk_id, _ in new_chunks],
+                        refreshed
+                    )
+        return {
+            "added": len(new_chunks),
+            "removed": len(removed_ids),
+            "unchanged": len(splits) - len(new_chunks)
+        }
+
+    async def _lookup_answer(
+        self,
+        user_id: int,
+        question: str,
+        cv_version: Optional[int]
+    ) -> Tuple[Optional[list], Optional[str]]:
+        """Embed the question and check the semantic answer cache, returning (embedding, cached answer)"""
+        if not settings.SEMANTIC_CACHE_ENABLED:
+            return None, None
+        # embed_query is cached in-process, so retrieval reuses this embedding for free
+        embedding = await asyncio.to_thread(self.embedding_model.embed_query, question)
+        return embedding, self.answer_cache.lookup(user_id, cv_version, embedding)
+
+    async def aquery_cv(self, user_id: int, question: str, cv_version: Optional[int] = None) -> dict:
+        """
+        Answer a question about the user's CV
+        
+        Retrieval runs in a worker thread, the LLM call on the shared async client. Returns
+        {"answer": str, "cached": bool, "coalesced": bool}. Paraphrases of a question already
+        answered for this CV are served from the semantic answer cache without retrieval or an LLM
+        call. A request identical to one still in flight shares its result and is marked coalesced.
+        """
+        result, shared = await self.in_flight.do(
+            ("chat", user_id, cv_version, question),
+            lambda: self._aquery_cv(user_id, question, cv_version)
+        )
+        return {**result, "coalesced": shared}
+
+    async def _aquery_cv(self, user_id: int, question: str, cv_version: Optional[int]) -> dict:
         try:
-            vectorstore = PGVector(
-                connection_string=settings.DATABASE_URL,
-                embedding_function=self.embedding_model,
-                collection_name=f"user_{user_id}_cv"
-            )
-            retriever = vectorstore.as_retriever(search_kwargs={"k": 8})
-            def format_docs(docs):
-                return "\n\n".join([d.page_content for d in docs])
-            # Retrieve context
-            context = format_docs(retriever.get_relevant_documents(question))
-            # Call DeepSeek API directly
-            return self._call_deepseek(context, question)
+            embedding, cached_answer = await self._lookup_answer(user_id, question, cv_version)
+            if cached_answer is not None:
+                return {"answer": cached_answer, "cached": True}
+            
+            context = await asyncio.to_thread(self._retrieve_context, user_id, question, 8, cv_version, CHAT_MODEL)
+            result = await llm_client.chat_completion(self._chat_request(context, question))
+            answer = self._chat_answer(result)
+            if embedding is not None:
+                self.answer_cache.store(user_id, cv_version, embedding, answer)
+            return {"answer": answer, "cached": False}
         except Exception as e:
             print(f"Query Error: {str(e)}")
             raise Exception(f"Failed to query CV with DeepSeek: {str(e)}")
 
-    def generate_application(self, user_id: int, job_description: str, application_type: str) -> dict:
+    async def astream_query_cv(
+        self,
+        user_id: int,
+        question: str,
+        cv_version: Optional[int] = None
+    ) -> Tuple[AsyncIterator[str], bool]:
+        """
+        Answer a question about the user's CV, yielding tokens as the LLM produces them
+        
+        Returns (tokens, cached). A semantic cache hit replays the stored answer as one token.
+        Retrieval runs before this returns so its errors surface before any response is sent.
+        """
+        try:
+            embedding, cached_answer = await self._lookup_answer(user_id, question, cv_version)
+            if cached_answer is None:
+                context = await asyncio.to_thread(self._retrieve_context, user_id, question, 8, cv_version, CHAT_MODEL)
+        except Exception as e:
+            print(f"Query Error: {str(e)}")
+            raise Exception(f"Failed to query CV with DeepSeek: {str(e)}")
+        
+        if cached_answer is not None:
+            async def replay():
+                yield cached_answer
+            return replay(), True
+        
+        async def tokens():
+            answer_parts = []
+            async for token in llm_client.stream_chat_completion(self._chat_request(context, question)):
+                answer_parts.append(token)
+                yield token
+            # Only completed answers are cached
+            if embedding is not None:
+                self.answer_cache.store(user_id, cv_version, embedding, "".join(answer_parts))
+        
+        return tokens(), False
+
+    async def agenerate_application(
+        self,
+        user_id: int,
+        job_description: str,
+        application_type: str,
+        cv_version: Optional[int] = None,
+        use_cache: bool = False
+    ) -> dict:
         """
         Generate a personalized cover letter or email based on CV and job description
         
+        Retrieval runs in a worker thread, the LLM call on the shared async client.
+        
         Args:
             user_id: The user's ID
             job_description: The job description text
             application_type: Either 'cover_letter' or 'email'
+            cv_version: ID of the user's current CV row, used to key cached vector store handles
+            use_cache: Return an earlier application for the same CV version, job and type if one exists
             
         Returns:
-            dict: For cover_letter returns {'content': str}, for email returns {'subject': str, 'content': str}
+            dict: For cover_letter returns {'content': str}, for email returns {'subject': str, 'content': str}.
+                Both include 'cached': bool, and cached results also carry the 'application_id' they came from.
+                A request identical to one still in flight shares its result, marked with "coalesced": True.
         """
+        result, shared = await self.in_flight.do(
+            ("application", user_id, cv_version, job_description, application_type, use_cache),
+            lambda: self._agenerate_application(user_id, job_description, application_type, cv_version, use_cache)
+        )
+        return {**result, "coalesced": shared}
+
+    async def _agenerate_application(
+        self,
+        user_id: int,
+        job_description: str,
+        application_type: str,
+        cv_version: Optional[int],
+        use_cache: bool
+    ) -> dict:
         try:
-            # Retrieve relevant CV sections
-            vectorstore = PGVector(
-                connection_string=settings.DATABASE_URL,
-                embedding_function=self.embedding_model,
-                collection_name=f"user_{user_id}_cv"
-            )
-            retriever = vectorstore.as_retriever(search_kwargs={"k": 10})
-            
-            def format_docs(docs):
-                return "\n\n".join([d.page_content for d in docs])
+            if use_cache and cv_version is not None:
+                cached = await asyncio.to_thread(
+                    find_cached_application, user_id, cv_version, job_description, application_type
+                )
+                if cached is not None:
+                    return {**cached, "cached": True}
             
-            # Get relevant CV context based on job description
-            cv_context = format_docs(retriever.get_relevant_documents(job_description))
-            
-            # Create appropriate prompt based on application type
-            if application_type == "cover_letter":
-                return self._generate_cover_letter(cv_context, job_description)
-            elif application_type == "email":
-                return self._generate_email(cv_context, job_description)
-            else:
-                raise ValueError(f"Invalid application_type: {application_type}")
+            cv_context = await asyncio.to_thread(
+                self._retrieve_context, user_id, job_description, 10, cv_version, APPLICATION_MODEL
+            )
+            return {**await self._agenerate_from_context(cv_context, job_description, application_type), "cached": False}
                 
         except Exception as e:
             print(f"Application Generation Error: {str(e)}")
             raise Exception(f"Failed to generate application: {str(e)}")
 
-    def _generate_cover_letter(self, cv_context: str, job_description: str) -> dict:
-        """Generate a personalized cover letter"""
-        API_URL = "https://router.huggingface.co/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {settings.HUGGINGFACE_API_KEY}",
-            "Content-Type": "application/json",
-        }
+    def _find_cached_pair(self, user_id: int, cv_version: Optional[int], job_description: str, use_cache: bool) -> dict:
+        """Earlier applications of each type for this CV and job, keyed by application type"""
+        results = {}
+        if use_cache and cv_version is not None:
+            for application_type in APPLICATION_TYPES:
+                cached = find_cached_application(user_id, cv_version, job_description, application_type)
+                if cached is not None:
+                    results[application_type] = {**cached, "cached": True}
+        return results
+
+    async def agenerate_both_applications(
+        self,
+        user_id: int,
+        job_description: str,
+        cv_version: Optional[int] = None,
+        use_cache: bool = False
+    ) -> dict:
+        """
+        Generate a cover letter and an email for the same job from a single retrieval
+        
+        Retrieval runs in a worker thread and the two LLM calls run concurrently. Returns
+        {"cover_letter": dict, "email": dict}, each shaped like agenerate_application's result.
+        With use_cache, a type already generated for this CV and job comes from history and only
+        the other one is generated. A request identical to one still in flight shares its
+        results, each marked "coalesced": True.
+        """
+        results, shared = await self.in_flight.do(
+            ("application", user_id, cv_version, job_description, "both", use_cache),
+            lambda: self._agenerate_both_applications(user_id, job_description, cv_version, use_cache)
+        )
+        return {application_type: {**result, "coalesced": shared} for application_type, result in results.items()}
+
+    async def _agenerate_both_applications(
+        self,
+        user_id: int,
+        job_description: str,
+        cv_version: Optional[int],
+        use_cache: bool
+    ) -> dict:
+        try:
+            results = await asyncio.to_thread(self._find_cached_pair, user_id, cv_version, job_description, use_cache)
+            missing = [application_type for application_type in APPLICATION_TYPES if application_type not in results]
+            if missing:
+                cv_context = await asyncio.to_thread(
+                    self._retrieve_context, user_id, job_description, 10, cv_version, APPLICATION_MODEL
+                )
+                generated = await asyncio.gather(*[
+                    self._agenerate_from_context(cv_context, job_description, application_type)
+                    for application_type in missing
+                ])
+                for application_type, result in zip(missing, generated):
+                    results[application_type] = {**result, "cached": False}
+            return results
+        
+        except Exception as e:
+            print(f"Application Generation Error: {str(e)}")
+            raise Exception(f"Failed to generate application: {str(e)}")
+
+    async def _agenerate_from_context(self, cv_context: str, job_description: str, application_type: str) -> dict:
+        """Run the LLM call for one application once its CV context has been retrieved"""
+        if application_type == "cover_letter":
+            result = await llm_client.chat_completion(self._cover_letter_request(cv_context, job_description))
+            return self._cover_letter_result(result)
+        elif application_type == "email":
+            result = await llm_client.chat_completion(self._email_request(cv_context, job_description))
+            return self._email_result(result)
+        else:
+            raise ValueError(f"Invalid application_type: {application_type}")
+
+    async def agenerate_applications(
+        self,
+        user_id: int,
+        items: List[Tuple[str, str, bool]],
+        cv_version: Optional[int] = None
+    ) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+        """
+        Generate several applications for one user, yielding (index, result, error) as each finishes
+        
+        items are (job_description, application_type, use_cache) tuples. The job descriptions not
+        answered from the application cache are embedded in one batch. Retrieval and the LLM calls
+        then run concurrently, at most APPLICATION_BATCH_CONCURRENCY at a time. result has the shape
+        agenerate_application returns; a failed item has error set instead.
+        """
+        def find_cached() -> list:
+            return [
+                find_cached_application(user_id, cv_version, job_description, application_type)
+                if use_cache and cv_version is not None else None
+                for job_description, application_type, use_cache in items
+            ]
+        
+        cached = await asyncio.to_thread(find_cached)
+        for index, result in enumerate(cached):
+            if result is not None:
+                yield index, {**result, "cached": True}, None
+        
+        pending = [index for index, result in enumerate(cached) if result is None]
+        if not pending:
+            return
+        try:
+            embeddings = await asyncio.to_thread(
+                self.embedding_model.embed_queries, [items[index][0] for index in pending]
+            )
+        except Exception as e:
+            print(f"Application Generation Error: {str(e)}")
+            for index in pending:
+                yield index, None, f"Failed to generate application: {str(e)}"
+            return
+        
+        semaphore = asyncio.Semaphore(max(1, settings.APPLICATION_BATCH_CONCURRENCY))
+        
+        async def generate(index: int, embedding: list) -> Tuple[int, Optional[dict], Optional[str]]:
+            job_description, application_type, _ = items[index]
+            async with semaphore:
+                try:
+                    cv_context = await asyncio.to_thread(
+                        self._retrieve_context, user_id, job_description, 10, cv_version, APPLICATION_MODEL, embedding
+                    )
+                    result = await self._agenerate_from_context(cv_context, job_description, application_type)
+                    return index, {**result, "cached": False}, None
+                except Exception as e:
+                    print(f"Application Generation Error: {str(e)}")
+                    return index, None, f"Failed to generate application: {str(e)}"
+        
+        tasks = [asyncio.create_task(generate(index, embedding)) for index, embedding in zip(pending, embeddings)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The consumer stopped early (e.g. a client disconnect), so drop the remaining work
+            for task in tasks:
+                task.cancel()
+
+    async def astream_application(
+        self,
+        user_id: int,
+        job_description: str,
+        application_type: str,
+        cv_version: Optional[int] = None,
+        use_cache: bool = False
+    ) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Generate a cover letter or email, yielding (event, data) pairs as the LLM produces it
+        
+        Yields ("subject", {"subject"}) for emails as soon as the subject line is complete,
+        ("content", {"html"}) for each converted piece of the body, and finally ("result", dict)
+        with the same shape agenerate_application returns. If an email completion doesn't follow
+        the expected format, a last ("content", {"html", "replace": True}) carries the fallback
+        body, replacing what was streamed. Retrieval runs before this returns.
+        """
+        if application_type not in ("cover_letter", "email"):
+            raise ValueError(f"Invalid application_type: {application_type}")
         
+        try:
+            cached = None
+            if use_cache and cv_version is not None:
+                cached = await asyncio.to_thread(
+                    find_cached_application, user_id, cv_version, job_description, application_type
+                )
+        except Exception as e:
+            print(f"Application Generation Error: {str(e)}")
+            raise Exception(f"Failed to generate application: {str(e)}")
+        
+        if cached is not None:
+            async def replay():
+                if "subject" in cached:
+                    yield "subject", {"subject": cached["subject"]}
+                yield "content", {"html": cached["content"]}
+                yield "result", {**cached, "cached": True}
+            return replay()
+        
+        try:
+            cv_context = await asyncio.to_thread(
+                self._retrieve_context, user_id, job_description, 10, cv_version, APPLICATION_MODEL
+            )
+        except Exception as e:
+            print(f"Application Generation Error: {str(e)}")
+            raise Exception(f"Failed to generate application: {str(e)}")
+        
+        if application_type == "cover_letter":
+            data = self._cover_letter_request(cv_context, job_description)
+        else:
+            data = self._email_request(cv_context, job_description)
+        
+        async def events():
+            completion = []
+            converter = IncrementalMarkdownConverter(self._markdown_to_html)
+            email_parser = EmailStreamParser() if application_type == "email" else None
+            
+            streamed = []
+            
+            async for delta in llm_client.stream_chat_completion(data):
+                completion.append(delta)
+                parts = email_parser.feed(delta) if email_parser else [("body", delta)]
+                for kind, text in parts:
+                    if kind == "subject":
+                        yield "subject", {"subject": text}
+                    else:
+                        html = converter.feed(text)
+                        if html:
+                            streamed.append(html)
+                            yield "content", {"html": html}
+            
+            html = converter.flush()
+            if html:
+                streamed.append(html)
+                yield "content", {"html": html}
+            
+            # The stored result comes from the full completion, exactly as the non-streaming path
+            full_content = "".join(completion)
+            if not email_parser:
+                yield "result", {"content": self._markdown_to_html(full_content), "cached": False}
+                return
+            
+            result = self._parse_email(full_content)
+            # When the completion doesn't follow the SUBJECT:/BODY: format, _parse_email falls back to
+            # a default subject and the whole completion, so resend whatever the stream got wrong
+            if result["subject"] != email_parser.subject:
+                yield "subject", {"subject": result["subject"]}
+            if result["content"] != "".join(streamed):
+                yield "content", {"html": result["content"], "replace": True}
+            yield "result", {**result, "cached": False}
+        
+        return events()
+
+    def _cover_letter_request(self, cv_context: str, job_description: str) -> dict:
+        """Build the chat-completions payload for a cover letter"""
         prompt = f"""You are an expert career advisor and professional writer. Create a compelling, personalized cover letter based on the candidate's CV and the job description.
 
 CV Information:
@@ -248,7 +950,7 @@ Requirements:
 Generate ONLY the cover letter content (no additional commentary). Include proper salutation and closing."""
 
         data = {
-            "model": "deepseek-ai/DeepSeek-V3.2",
+            "model": APPLICATION_MODEL,
             "messages": [
                 {"role": "system", "content": "You are an expert career advisor specializing in writing compelling cover letters that get results."},
                 {"role": "user", "content": prompt}
@@ -256,28 +958,20 @@ Generate ONLY the cover letter content (no additional commentary). Include prope
             "max_tokens": 2048,
             "temperature": 0.8
         }
-        
-        response = requests.post(API_URL, headers=headers, json=data)
-        if response.status_code == 200:
-            result = response.json()
-            try:
-                content = result["choices"][0]["message"]["content"]
-                # Convert markdown to HTML
-                content_html = self._markdown_to_html(content)
-                return {"content": content_html}
-            except Exception:
-                return {"content": str(result)}
-        else:
-            raise Exception(f"DeepSeek API error: {response.status_code} {response.text}")
-
-    def _generate_email(self, cv_context: str, job_description: str) -> dict:
-        """Generate a personalized email with subject line"""
-        API_URL = "https://router.huggingface.co/v1/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {settings.HUGGINGFACE_API_KEY}",
-            "Content-Type": "application/json",
-        }
-        
+        return data
+
+    def _cover_letter_result(self, result: dict) -> dict:
+        """Extract the cover letter from a chat-completions response"""
+        try:
+            content = result["choices"][0]["message"]["content"]
+            # Convert markdown to HTML
+            content_html = self._markdown_to_html(content)
+            return {"content": content_html}
+        except Exception:
+            return {"content": str(result)}
+
+    def _email_request(self, cv_context: str, job_description: str) -> dict:
+        """Build the chat-completions payload for an application email"""
         prompt = f"""You are an expert career advisor and professional writer. Create a compelling, personalized job application email based on the candidate's CV and the job description.
 
 CV Information:
@@ -306,7 +1000,7 @@ BODY:
 Generate ONLY the subject and body (no additional commentary)."""
 
         data = {
-            "model": "deepseek-ai/DeepSeek-V3.2",
+            "model": APPLICATION_MODEL,
             "messages": [
                 {"role": "system", "content": "You are an expert career advisor specializing in writing compelling job application emails."},
                 {"role": "user", "content": prompt}
@@ -314,42 +1008,44 @@ Generate ONLY the subject and body (no additional commentary)."""
             "max_tokens": 1536,
             "temperature": 0.8
         }
+        return data
+
+    def _parse_email(self, full_content: str) -> dict:
+        """Split an email completion into its subject and HTML body"""
+        # Parse subject and body
+        lines = full_content.split('\n')
+        subject = ""
+        body_lines = []
+        in_body = False
         
-        response = requests.post(API_URL, headers=headers, json=data)
-        if response.status_code == 200:
-            result = response.json()
-            try:
-                full_content = result["choices"][0]["message"]["content"]
-                # Parse subject and body
-                lines = full_content.split('\n')
-                subject = ""
-                body_lines = []
-                in_body = False
-                
-                for line in lines:
-                    if line.startswith("SUBJECT:"):
-                        subject = line.replace("SUBJECT:", "").strip()
-                    elif line.startswith("BODY:"):
-                        in_body = True
-                    elif in_body:
-                        body_lines.append(line)
-                
-                body = '\n'.join(body_lines).strip()
-                
-                # Fallback if parsing fails
-                if not subject or not body:
-                    subject = "Application for Position"
-                    body = full_content
-                
-                # Convert markdown to HTML in body
-                body_html = self._markdown_to_html(body)
-                
-                return {"subject": subject, "content": body_html}
-            except Exception as e:
-                print(f"Parsing error: {e}")
-                return {"subject": "Application for Position", "content": str(result)}
-        else:
-            raise Exception(f"DeepSeek API error: {response.status_code} {response.text}")
+        for line in lines:
+            if line.startswith("SUBJECT:"):
+                subject = line.replace("SUBJECT:", "").strip()
+            elif line.startswith("BODY:"):
+                in_body = True
+            elif in_body:
+                body_lines.append(line)
+        
+        body = '\n'.join(body_lines).strip()
+        
+        # Fallback if parsing fails
+        if not subject or not body:
+            subject = "Application for Position"
+            body = full_content
+        
+        # Convert markdown to HTML in body
+        body_html = self._markdown_to_html(body)
+        
+        return {"subject": subject, "content": body_html}
+
+    def _email_result(self, result: dict) -> dict:
+        """Extract the subject and body from a chat-completions response"""
+        try:
+            full_content = result["choices"][0]["message"]["content"]
+            return self._parse_email(full_content)
+        except Exception as e:
+            print(f"Parsing error: {e}")
+            return {"subject": "Application for Position", "content": str(result)}
 
 # Singleton instance
 rag_service = RAGService()
\ No newline at end of file
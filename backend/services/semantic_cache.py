@@ -0,0 +1,56 @@
+import threading
+from typing import Optional
+import numpy as np
+from utils.cache import TTLCache
+
+
+def _normalize(embedding) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticAnswerCache:
+    """Per-user cache of chat answers, matched by cosine similarity of the question embeddings"""
+    def __init__(self, threshold: float = 0.9, max_entries: int = 50, max_users: int = 1000, ttl: float = 3600):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # (user_id, cv_version) -> (question matrix, answers), replaced wholesale on every store
+        self._entries = TTLCache(maxsize=max_users, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def lookup(self, user_id: int, cv_version: Optional[int], embedding: list) -> Optional[str]:
+        """Return the answer to the most similar cached question, if it clears the threshold"""
+        entry = self._entries.get((user_id, cv_version))
+        if entry is not None:
+            vectors, answers = entry
+            scores = vectors @ _normalize(embedding)
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                self.hits += 1
+                return answers[best]
+        self.misses += 1
+        return None
+
+    def store(self, user_id: int, cv_version: Optional[int], embedding: list, answer: str):
+        key = (user_id, cv_version)
+        vector = _normalize(embedding)[np.newaxis, :]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                vectors, answers = vector, [answer]
+            else:
+                # Oldest entries drop off first once a user reaches max_entries
+                vectors = np.vstack([entry[0], vector])[-self.max_entries:]
+                answers = (entry[1] + [answer])[-self.max_entries:]
+            self._entries.set(key, (vectors, answers))
+
+    def invalidate(self, user_id: int):
+        """Forget every cached answer for a user, e.g. after their CV is re-indexed"""
+        for key in [key for key in self._entries.keys() if key[0] == user_id]:
+            self._entries.pop(key)
+
+    def stats(self) -> dict:
+        return {"users": self._entries.stats()["size"], "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,87 @@
+import re
+from typing import Callable, List, Tuple
+
+
+class IncrementalMarkdownConverter:
+    """
+    Applies a line-local markdown-to-HTML converter to streamed text
+
+    The converter's patterns never span a newline, so completed lines convert exactly as they
+    would as part of the whole text. Within the current line, text before the first emphasis
+    marker can't be part of a match either, so it is released immediately and only the rest of
+    the line is held back until it is complete.
+    """
+    def __init__(self, convert: Callable[[str], str]):
+        self.convert = convert
+        self.pending = ""
+
+    def feed(self, text: str) -> str:
+        """Add streamed text and return any HTML that is now final"""
+        self.pending += text
+        html = ""
+
+        line_end = self.pending.rfind("\n")
+        if line_end >= 0:
+            html += self.convert(self.pending[:line_end + 1])
+            self.pending = self.pending[line_end + 1:]
+
+        marker = re.search(r"[*_]", self.pending)
+        safe = marker.start() if marker else len(self.pending)
+        if safe:
+            html += self.convert(self.pending[:safe])
+            self.pending = self.pending[safe:]
+
+        return html
+
+    def flush(self) -> str:
+        """Convert whatever is left once the stream has ended"""
+        html = self.convert(self.pending) if self.pending else ""
+        self.pending = ""
+        return html
+
+
+class EmailStreamParser:
+    """
+    Splits a streamed "SUBJECT: ... BODY: ..." email completion into parts as they arrive
+
+    Mirrors RAGService._parse_email: the subject is released once its line is complete, and body
+    text is trimmed the same way as the full parse (leading and trailing whitespace removed).
+    """
+    def __init__(self):
+        self.subject = ""
+        self.in_body = False
+        self._line = ""
+        self._body_started = False
+        self._held_whitespace = ""
+
+    def feed(self, text: str) -> List[Tuple[str, str]]:
+        """Add streamed text and return newly available ("subject", text) / ("body", text) parts"""
+        parts = []
+        if not self.in_body:
+            self._line += text
+            text = ""
+            while not self.in_body and "\n" in self._line:
+                line, self._line = self._line.split("\n", 1)
+                if line.startswith("SUBJECT:"):
+                    self.subject = line.replace("SUBJECT:", "").strip()
+                    parts.append(("subject", self.subject))
+                elif line.startswith("BODY:"):
+                    self.in_body = True
+            if not self.in_body:
+                return parts
+            text, self._line = self._line, ""
+
+        text = self._held_whitespace + text
+        if not self._body_started:
+            text = text.lstrip()
+            if not text:
+                self._held_whitespace = ""
+                return parts
+            self._body_started = True
+
+        # Trailing whitespace is only released once more body text follows it
+        body = text.rstrip()
+        self._held_whitespace = text[len(body):]
+        if body:
+            parts.append(("body", body))
+        return parts
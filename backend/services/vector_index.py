@@ -0,0 +1,140 @@
+"""
+Index management for the pgvector embedding table
+
+langchain creates langchain_pg_embedding without any index on collection_id or the embedding
+column, so every search scans the vectors of all users. This module maintains:
+
+- a b-tree index on collection_id, so a user's search only touches their own chunks
+- an optional HNSW or IVFFlat index (VECTOR_INDEX_TYPE) for collections large enough that the
+  planner prefers an approximate scan
+
+The embedding column has no declared dimension, so the ANN index is built over a cast to
+vector(EMBEDDING_DIMENSION); UserVectorStore searches with the same expression so the index
+applies, and with the bare column when it needs an exact scan that the index can't serve.
+
+Run as a script to create missing indexes, or with --rebuild after bulk growth:
+
+    python -m services.vector_index [--rebuild]
+"""
+import argparse
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from config import settings
+from database import engine
+
+EMBEDDING_TABLE = "langchain_pg_embedding"
+COLLECTION_INDEX = "ix_langchain_pg_embedding_collection_id"
+ANN_INDEX = "ix_langchain_pg_embedding_ann"
+
+
+def vector_expression() -> str:
+    return f"(embedding::vector({settings.EMBEDDING_DIMENSION}))"
+
+
+def scoped_search_sql(exact: bool = False) -> str:
+    """
+    Cosine search over one collection, written against the indexed expression
+
+    With exact, the distance is computed on the bare column instead, which the ANN index doesn't
+    match, so Postgres reads the collection's rows through the collection_id index and sorts them.
+    """
+    dimension = settings.EMBEDDING_DIMENSION
+    expression = "embedding" if exact else vector_expression()
+    return (
+        f"SELECT document, cmetadata, {expression} <=> CAST(:embedding AS vector({dimension})) AS distance "
+        f"FROM {EMBEDDING_TABLE} WHERE collection_id = :collection_id "
+        f"ORDER BY distance LIMIT :k"
+    )
+
+
+_iterative_scan_supported: Optional[bool] = None
+
+
+def iterative_scan_supported(session: Session) -> bool:
+    """Whether the installed pgvector (0.8+) can keep scanning an index when a filter discards rows"""
+    global _iterative_scan_supported
+    if _iterative_scan_supported is None:
+        version = session.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")).scalar()
+        parts = tuple(int(part) for part in (version or "0").split(".")[:2] if part.isdigit())
+        _iterative_scan_supported = parts >= (0, 8)
+    return _iterative_scan_supported
+
+
+def apply_search_settings(session: Session):
+    """Set the ANN recall/speed trade-off for the current transaction"""
+    if settings.VECTOR_INDEX_TYPE not in ("hnsw", "ivfflat"):
+        return
+    if settings.VECTOR_INDEX_TYPE == "hnsw":
+        session.execute(text(f"SET LOCAL hnsw.ef_search = {int(settings.VECTOR_HNSW_EF_SEARCH)}"))
+    else:
+        session.execute(text(f"SET LOCAL ivfflat.probes = {int(settings.VECTOR_IVFFLAT_PROBES)}"))
+    if settings.VECTOR_ITERATIVE_SCAN and iterative_scan_supported(session):
+        # Keep scanning when the collection filter discards candidates, instead of returning short
+        session.execute(text(
+            f"SET LOCAL {settings.VECTOR_INDEX_TYPE}.iterative_scan = {settings.VECTOR_ITERATIVE_SCAN}"
+        ))
+
+
+def _ivfflat_lists(connection) -> int:
+    """Configured list count, or pgvector's guideline (rows/1000, sqrt(rows) past a million)"""
+    if settings.VECTOR_IVFFLAT_LISTS > 0:
+        return settings.VECTOR_IVFFLAT_LISTS
+    rows = connection.execute(text(f"SELECT count(*) FROM {EMBEDDING_TABLE}")).scalar()
+    if rows > 1_000_000:
+        return int(rows ** 0.5)
+    return max(1, rows // 1000)
+
+
+def ann_index_sql(connection) -> Optional[str]:
+    index_type = settings.VECTOR_INDEX_TYPE
+    if index_type == "none":
+        return None
+    if index_type == "hnsw":
+        options = f"m = {settings.VECTOR_HNSW_M}, ef_construction = {settings.VECTOR_HNSW_EF_CONSTRUCTION}"
+    elif index_type == "ivfflat":
+        options = f"lists = {_ivfflat_lists(connection)}"
+    else:
+        raise Exception(f"Unknown VECTOR_INDEX_TYPE: {index_type}")
+    return (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {ANN_INDEX} ON {EMBEDDING_TABLE} "
+        f"USING {index_type} ({vector_expression()} vector_cosine_ops) WITH ({options})"
+    )
+
+
+def ensure_vector_indexes() -> bool:
+    """Create any missing vector-table indexes; returns False if the table doesn't exist yet"""
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        if connection.execute(text(f"SELECT to_regclass('{EMBEDDING_TABLE}')")).scalar() is None:
+            return False
+        connection.execute(text(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {COLLECTION_INDEX} ON {EMBEDDING_TABLE} (collection_id)"
+        ))
+        statement = ann_index_sql(connection)
+        if statement:
+            connection.execute(text(statement))
+        else:
+            # VECTOR_INDEX_TYPE=none: don't keep paying for an index created under an earlier setting
+            connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {ANN_INDEX}"))
+        connection.execute(text(f"ANALYZE {EMBEDDING_TABLE}"))
+    return True
+
+
+def rebuild_ann_index() -> bool:
+    """Drop and recreate the ANN index, e.g. after IVFFlat data growth or a VECTOR_INDEX_TYPE change"""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {ANN_INDEX}"))
+    return ensure_vector_indexes()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rebuild", action="store_true", help="Recreate the ANN index from scratch")
+    args = parser.parse_args()
+
+    created = rebuild_ann_index() if args.rebuild else ensure_vector_indexes()
+    if created:
+        print(f"Vector indexes ready ({settings.VECTOR_INDEX_TYPE}) on {EMBEDDING_TABLE}")
+    else:
+        print(f"{EMBEDDING_TABLE} does not exist yet; run again after the first CV is processed")
@@ -0,0 +1,186 @@
+import json
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import bindparam, delete, text, update
+from sqlalchemy.orm import Session
+from langchain_community.vectorstores import PGVector
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from config import settings
+from database import engine
+from services.embedding_cache import content_hash
+from services.vector_index import apply_search_settings, scoped_search_sql
+from utils.cache import TTLCache
+
+
+def collection_name_for(user_id: int) -> str:
+    return f"user_{user_id}_cv"
+
+
+def chunk_ids_for(chunks: List[Document], model_name: str) -> List[str]:
+    """
+    Stable ids for a CV's chunks, derived from their text, page and the embedding model
+
+    Re-splitting an unchanged CV yields the same ids, so only edited chunks differ between
+    versions. The rest of the metadata (the uploaded filename as source) is left out, so renaming
+    the file doesn't change them. Identical chunks get an occurrence suffix to keep the ids unique.
+    """
+    ids = []
+    seen = {}
+    for chunk in chunks:
+        key = content_hash(json.dumps(
+            {"model": model_name, "text": chunk.page_content, "page": chunk.metadata.get("page")},
+            sort_keys=True,
+            default=str
+        ))
+        occurrence = seen.get(key, 0)
+        seen[key] = occurrence + 1
+        ids.append(key if occurrence == 0 else f"{key}:{occurrence}")
+    return ids
+
+
+class UserVectorStore(PGVector):
+    """PGVector bound to the shared engine that resolves its collection row once"""
+    _collection = None
+    _chunk_count = None
+
+    def get_collection(self, session):
+        # The collection row only changes when process_cv rebuilds it, which invalidates this handle
+        if self._collection is None:
+            self._collection = super().get_collection(session)
+        return self._collection
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Cosine search scoped to this collection, without langchain's join against the collection table
+
+        Written against the indexed expression in services.vector_index, so Postgres can use the
+        collection_id index or the ANN index, tuned by ef_search/probes. The ANN index is shared by
+        all users and the collection filter is applied to its candidates, so without an iterative
+        scan it can come back with fewer than k rows. A result shorter than the collection allows
+        is rerun as an exact scan.
+        """
+        if filter:
+            return super().similarity_search_with_score_by_vector(embedding, k=k, filter=filter)
+
+        parameters = {"embedding": str([float(x) for x in embedding]), "k": k}
+        with Session(self._bind) as session:
+            collection = self.get_collection(session)
+            if not collection:
+                raise ValueError("Collection not found")
+            parameters["collection_id"] = collection.uuid
+            apply_search_settings(session)
+            rows = session.execute(text(scoped_search_sql()), parameters).all()
+            if settings.VECTOR_INDEX_TYPE != "none" and len(rows) < k:
+                if self._chunk_count is None:
+                    # Handles are replaced when the CV is re-processed, so the count can't go stale
+                    self._chunk_count = session.query(self.EmbeddingStore).filter(
+                        self.EmbeddingStore.collection_id == collection.uuid
+                    ).count()
+                if len(rows) < min(k, self._chunk_count):
+                    rows = session.execute(text(scoped_search_sql(exact=True)), parameters).all()
+        # relaxed_order iterative scans may return rows slightly out of distance order
+        rows = sorted(rows, key=lambda row: row.distance)
+        return [(Document(page_content=row.document, metadata=row.cmetadata), row.distance) for row in rows]
+
+    def load_chunks(self) -> Tuple[List[str], list]:
+        """Every chunk text in this collection with its embedding, for in-process search"""
+        with Session(self._bind) as session:
+            collection = self.get_collection(session)
+            if not collection:
+                raise ValueError("Collection not found")
+            rows = session.query(self.EmbeddingStore.document, self.EmbeddingStore.embedding).filter(
+                self.EmbeddingStore.collection_id == collection.uuid
+            ).all()
+        return [row.document for row in rows], [row.embedding for row in rows]
+
+    def stored_chunk_ids(self) -> set:
+        """Ids of the chunks currently stored in this collection"""
+        return set(self.stored_chunk_metadata())
+
+    def stored_chunk_metadata(self) -> Dict[str, dict]:
+        """Metadata of the chunks currently stored in this collection, keyed by chunk id"""
+        with Session(self._bind) as session:
+            collection = self.get_collection(session)
+            rows = session.query(self.EmbeddingStore.custom_id, self.EmbeddingStore.cmetadata).filter(
+                self.EmbeddingStore.collection_id == collection.uuid
+            ).all()
+            return {row.custom_id: row.cmetadata for row in rows}
+
+    def apply_chunk_diff(
+        self,
+        removed_ids: List[str],
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[dict],
+        ids: List[str],
+        refreshed: Optional[Dict[str, dict]] = None
+    ):
+        """
+        Delete removed chunks and insert new ones in a single transaction, scoped to this collection
+
+        refreshed maps ids of kept chunks to new metadata (e.g. after the CV file was renamed).
+        """
+        with Session(self._bind) as session:
+            collection = self.get_collection(session)
+            if refreshed:
+                table = self.EmbeddingStore.__table__
+                session.execute(
+                    update(table).where(
+                        table.c.collection_id == collection.uuid,
+                        table.c.custom_id == bindparam("chunk_id")
+                    ).values(cmetadata=bindparam("metadata")),
+                    [{"chunk_id": chunk_id, "metadata": metadata} for chunk_id, metadata in refreshed.items()]
+                )
+            if removed_ids:
+                session.execute(
+                    delete(self.EmbeddingStore).where(
+                        self.EmbeddingStore.collection_id == collection.uuid,
+                        self.EmbeddingStore.custom_id.in_(removed_ids)
+                    )
+                )
+            session.bulk_save_objects([
+                self.EmbeddingStore(
+                    embedding=embedding,
+                    document=text,
+                    cmetadata=metadata,
+                    custom_id=chunk_id,
+                    collection_id=collection.uuid
+                )
+                for text, metadata, embedding, chunk_id in zip(texts, metadatas, embeddings, ids)
+            ])
+            session.commit()
+
+
+class VectorStoreRegistry:
+    """LRU of per-user vector store handles sharing the application's connection pool"""
+    def __init__(self, embedding_function: Embeddings, maxsize: int = 256):
+        self.embedding_function = embedding_function
+        self._stores = TTLCache(maxsize=maxsize, ttl=float("inf"))
+
+    def get(self, user_id: int, cv_version: Optional[int] = None) -> PGVector:
+        """Return the vector store for a user's CV, keyed by CV version so re-uploads never see stale handles"""
+        key = (user_id, cv_version)
+        store = self._stores.get(key)
+        if store is None:
+            store = UserVectorStore(
+                connection_string=settings.DATABASE_URL,
+                embedding_function=self.embedding_function,
+                collection_name=collection_name_for(user_id),
+                connection=engine,
+                create_extension=False
+            )
+            self._stores.set(key, store)
+        return store
+
+    def stats(self) -> dict:
+        return self._stores.stats()
+
+    def invalidate(self, user_id: int):
+        """Drop every cached handle for a user after their collection is rebuilt"""
+        for key in [key for key in self._stores.keys() if key[0] == user_id]:
+            self._stores.pop(key)
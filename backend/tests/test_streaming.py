@@ -0,0 +1,105 @@
+import asyncio
+import pytest
+import services.rag_service as rag_module
+from services.rag_service import rag_service
+from services.streaming import IncrementalMarkdownConverter, EmailStreamParser
+
+MARKDOWN_TEXTS = [
+    "Plain text with no markdown",
+    "Dear **Hiring Manager**,\n\nI am *excited* to apply.\n",
+    "Built __data pipelines__ and _tested_ them.\nSecond line with **bold** and *italic*.",
+    "Unclosed **bold on one line\nand the close** on the next",
+    "snake_case_name and 2 * 3 * 4\n\n\n",
+    "",
+]
+
+EMAILS = [
+    "SUBJECT: Application for Data Engineer\nBODY:\nDear **Team**,\n\nI would love to join.\n\nBest,\nJane",
+    "SUBJECT: Hello\n\nBODY:\n\n  Body with leading blank lines  \n\n",
+    "Sure, here is the email:\nSUBJECT: Backend role\nBODY:\nShort *body*",
+]
+
+# Completions _parse_email falls back on
+MALFORMED_EMAILS = [
+    "**SUBJECT:** Data Engineer role\n**BODY:**\nDear **Team**,\nI would love to join.",
+    "Subject: Data Engineer role\nBody:\nDear Team,\nI would love to join.",
+    "SUBJECT: Data Engineer role\nDear Team,\nI would love to join.",
+    "BODY:\nDear Team,\nthere was no subject line.",
+]
+
+
+def chunkings(text):
+    """The text whole, one character at a time, and in a few fixed chunk sizes"""
+    yield [text]
+    yield list(text)
+    for size in (2, 3, 7, 16):
+        yield [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def convert_stream(chunks):
+    converter = IncrementalMarkdownConverter(rag_service._markdown_to_html)
+    return "".join(converter.feed(chunk) for chunk in chunks) + converter.flush()
+
+
+@pytest.mark.parametrize("text", MARKDOWN_TEXTS)
+def test_incremental_markdown_matches_full_conversion(text):
+    for chunks in chunkings(text):
+        assert convert_stream(chunks) == rag_service._markdown_to_html(text)
+
+
+@pytest.mark.parametrize("completion", EMAILS)
+def test_email_stream_parser_matches_parse_email(completion):
+    expected = rag_service._parse_email(completion)
+    for chunks in chunkings(completion):
+        parser = EmailStreamParser()
+        parts = [part for chunk in chunks for part in parser.feed(chunk)]
+        subjects = [text for kind, text in parts if kind == "subject"]
+        body = [text for kind, text in parts if kind == "body"]
+
+        assert subjects == [expected["subject"]]
+        assert convert_stream(body) == expected["content"]
+
+
+def stream_email(completion, monkeypatch, chunk_size=5):
+    """Run astream_application for an email against a stubbed LLM; returns the events"""
+    class FakeLLM:
+        async def stream_chat_completion(self, data):
+            for i in range(0, len(completion), chunk_size):
+                yield completion[i:i + chunk_size]
+
+    monkeypatch.setattr(rag_module, "llm_client", FakeLLM())
+    monkeypatch.setattr(rag_service, "_retrieve_context", lambda *args, **kwargs: "CV context")
+
+    async def collect():
+        events = await rag_service.astream_application(1, "Data Engineer", "email")
+        return [event async for event in events]
+    return asyncio.run(collect())
+
+
+def streamed_body(events):
+    """The body a client assembles from content events"""
+    html = ""
+    for event, data in events:
+        if event == "content":
+            html = data["html"] if data.get("replace") else html + data["html"]
+    return html
+
+
+@pytest.mark.parametrize("completion", EMAILS + MALFORMED_EMAILS)
+def test_streamed_email_matches_result(completion, monkeypatch):
+    events = stream_email(completion, monkeypatch)
+    event, result = events[-1]
+    subjects = [data["subject"] for event, data in events if event == "subject"]
+
+    assert event == "result"
+    assert result["content"] == rag_service._parse_email(completion)["content"]
+    assert streamed_body(events) == result["content"]
+    assert subjects[-1] == result["subject"]
+
+
+@pytest.mark.parametrize("completion", MALFORMED_EMAILS)
+def test_malformed_email_still_streams_content(completion, monkeypatch):
+    events = stream_email(completion, monkeypatch)
+
+    assert any(event == "content" for event, _ in events)
+    assert rag_service._parse_email(completion)["subject"] == "Application for Position"
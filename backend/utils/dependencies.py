@@ -1,16 +1,45 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import event
 from sqlalchemy.orm import Session
-from database import get_db
-from models import User
+from config import settings
+from database import SessionLocal
+from models import User, CV
+from schemas import AuthenticatedUser
 from utils.auth import verify_token
+from utils.cache import TTLCache
 
 security = HTTPBearer()
 
+# Resolved users by id; only found users are cached, so new signups are never shadowed
+_user_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL)
+
+def invalidate_cached_user(user_id: int):
+    """Forget a cached user after their account is changed or deleted"""
+    _user_cache.pop(user_id)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_on_account_change(mapper, connection, target):
+    invalidate_cached_user(target.id)
+
+def _load_user(user_id: int):
+    db = SessionLocal()
+    try:
+        user = db.query(User.id, User.email).filter(User.id == user_id).first()
+        return AuthenticatedUser(id=user.id, email=user.email) if user else None
+    finally:
+        db.close()
+
 def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> AuthenticatedUser:
+    """
+    Resolve the bearer token to the authenticated user
+
+    Users are cached in-process for USER_CACHE_TTL seconds, so most requests need no database
+    session just to authenticate.
+    """
     token = credentials.credentials
     payload = verify_token(token)
     
@@ -36,11 +65,33 @@ def get_current_user(
             detail="Invalid user ID format"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = _user_cache.get(user_id)
     if user is None:
+        user = _load_user(user_id)
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found"
+            )
+        _user_cache.set(user_id, user)
+    
+    return user
+
+def get_processed_cv(db: Session, user_id: int) -> CV:
+    """Return the user's CV, or raise if it is missing or not yet processed"""
+    # Check if user has uploaded a CV
+    cv = db.query(CV).filter(CV.user_id == user_id).first()
+    if not cv:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Please upload your CV first"
         )
     
-    return user
+    # Check if CV is processed
+    if not cv.processed:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Your CV is still being processed. Please try again in a moment."
+        )
+    
+    return cv
@@ -0,0 +1,54 @@
+import hashlib
+from typing import Awaitable, Callable, Optional
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from config import settings
+from services.metrics import cache_stats
+from utils.cache import TTLCache
+from utils.single_flight import SingleFlight
+
+# (user_id, route, key) -> (request fingerprint, response body) for completed requests
+_responses = TTLCache(maxsize=settings.IDEMPOTENCY_CACHE_SIZE, ttl=settings.IDEMPOTENCY_KEY_TTL)
+_in_flight = SingleFlight()
+cache_stats.register("idempotency", _responses.stats)
+
+
+async def run_idempotent(
+    user_id: int,
+    route: str,
+    key: Optional[str],
+    payload: BaseModel,
+    handler: Callable[[], Awaitable[BaseModel]]
+):
+    """
+    Run handler at most once per Idempotency-Key within IDEMPOTENCY_KEY_TTL
+
+    A retry with the same key gets the stored response back with an `Idempotency-Replayed`
+    header, and a retry arriving while the first request is still running waits for it. Reusing
+    a key for a different payload is rejected. Failed requests aren't stored, so they can be
+    retried with the same key. Without a key, handler simply runs.
+    """
+    if not key:
+        return await handler()
+
+    scope = (user_id, route, key)
+    fingerprint = hashlib.sha256(payload.model_dump_json().encode("utf-8")).hexdigest()
+    stored = _responses.get(scope)
+    replayed = stored is not None
+    if not replayed:
+        async def execute():
+            body = jsonable_encoder(await handler())
+            _responses.set(scope, (fingerprint, body))
+            return fingerprint, body
+        stored, replayed = await _in_flight.do(scope, execute)
+
+    stored_fingerprint, body = stored
+    if stored_fingerprint != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used with a different request"
+        )
+    headers = {"Idempotency-Replayed": "true"} if replayed else None
+    return JSONResponse(content=body, headers=headers)
@@ -0,0 +1,33 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """Coalesces concurrent async calls with the same key onto one in-flight call"""
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Await fn(), or the call already in flight for key; returns (result, shared)
+
+        shared is True for callers that joined an existing call. Exceptions reach every caller.
+        """
+        # Tasks can only be awaited from their own event loop
+        key = (id(asyncio.get_running_loop()), key)
+        task = self._tasks.get(key)
+        shared = task is not None
+        if shared:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        # Shielded so one caller disconnecting doesn't cancel the call for the others
+        return await asyncio.shield(task), shared
+
+    def stats(self) -> dict:
+        return {"size": len(self._tasks), "hits": self.coalesced, "misses": self.calls}
@@ -0,0 +1,13 @@
+import json
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Events message with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# Keep proxies (nginx, Heroku router) from buffering the stream
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
@@ -0,0 +1,55 @@
+"""
+CV processing worker
+
+Claims queued jobs from cv_processing_jobs and runs them on a thread pool, so ingestion can be
+scaled separately from the API. Run with CV_PROCESSING_MODE=queue on the API side:
+
+    python worker.py
+"""
+import os
+import signal
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import settings
+
+
+def run_worker():
+    # Imported here rather than at module level: PDF extraction's spawn workers re-import this
+    # module as __mp_main__, and must not each build a RAGService (and its embedding model)
+    from services.cv_jobs import claim_next_job, run_claimed_job
+    from services.rag_service import rag_service
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    pool_size = settings.CV_WORKER_POOL_SIZE
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        print(f"CV worker {worker_id} stopping, waiting for running jobs...")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    rag_service.verify_embedding_dimension()
+    print(f"CV worker {worker_id} started with {pool_size} threads")
+    with ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="cv-job") as executor:
+        running = set()
+        while not stop.is_set():
+            running = {future for future in running if not future.done()}
+            if len(running) < pool_size:
+                try:
+                    job_id = claim_next_job(worker_id)
+                except Exception as e:
+                    print(f"Error claiming CV job: {str(e)}")
+                    job_id = None
+                if job_id is not None:
+                    print(f"CV worker {worker_id} claimed job {job_id}")
+                    running.add(executor.submit(run_claimed_job, job_id))
+                    continue
+            stop.wait(settings.CV_JOB_POLL_INTERVAL)
+    print(f"CV worker {worker_id} stopped")
+
+
+if __name__ == "__main__":
+    run_worker()
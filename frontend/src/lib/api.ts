@@ -60,13 +60,24 @@ export const cvAPI = {
   delete: () => api.delete('/api/cv/delete'),
 };
 
+// A key identifies one logical submission: pages create it when a form is submitted, keep it
+// while that submission is retried, and drop it once it succeeds or the payload changes, so a
+// retry replays the first response instead of generating (and saving) a second one
+export const newIdempotencyKey = () =>
+  typeof crypto !== 'undefined' && 'randomUUID' in crypto
+    ? crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
+const idempotencyHeaders = (idempotencyKey?: string) =>
+  idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : undefined;
+
 // Chat API
 export const chatAPI = {
-  ask: (question: string) =>
-    api.post('/api/chat/ask', { question }),
+  ask: (question: string, idempotencyKey?: string) =>
+    api.post('/api/chat/ask', { question }, { headers: idempotencyHeaders(idempotencyKey) }),
   
-  getHistory: () =>
-    api.get('/api/chat/history'),
+  getHistory: (cursor?: string) =>
+    api.get('/api/chat/history', { params: { cursor } }),
   
   deleteMessage: (messageId: number) =>
     api.delete(`/api/chat/history/${messageId}`),
@@ -77,11 +88,25 @@ export const chatAPI = {
 
 // Application API
 export const applicationAPI = {
-  generate: (job_description: string, application_type: 'cover_letter' | 'email') =>
-    api.post('/api/application/generate', { job_description, application_type }),
+  generate: (
+    job_description: string,
+    application_type: 'cover_letter' | 'email' | 'both',
+    idempotencyKey?: string
+  ) =>
+    api.post(
+      '/api/application/generate',
+      { job_description, application_type },
+      { headers: idempotencyHeaders(idempotencyKey) }
+    ),
+  
+  generateBatch: (
+    items: { job_description: string; application_type: 'cover_letter' | 'email' }[],
+    idempotencyKey?: string
+  ) =>
+    api.post('/api/application/generate/batch', { items }, { headers: idempotencyHeaders(idempotencyKey) }),
   
-  getHistory: () =>
-    api.get('/api/application/history'),
+  getHistory: (cursor?: string) =>
+    api.get('/api/application/history', { params: { cursor } }),
   
   getDetail: (applicationId: number) =>
     api.get(`/api/application/history/${applicationId}`),
@@ -1,7 +1,7 @@
 import { useState, useEffect } from 'react';
 import { useRouter } from 'next/router';
 import { useAuth } from '@/contexts/AuthContext';
-import { applicationAPI, cvAPI } from '@/lib/api';
+import { applicationAPI, cvAPI, newIdempotencyKey } from '@/lib/api';
 import {
   Card,
   Input,
@@ -41,16 +41,29 @@ interface HistoryApplication {
   created_at: string;
 }
 
+interface ApplicationSummary {
+  id: number;
+  application_type: string;
+  subject: string | null;
+  snippet: string;
+  job_description_snippet: string;
+  created_at: string;
+}
+
 export default function Application() {
   const { user, loading: authLoading } = useAuth();
   const [jobDescription, setJobDescription] = useState('');
   const [applicationType, setApplicationType] = useState<'cover_letter' | 'email'>('cover_letter');
   const [loading, setLoading] = useState(false);
+  // Idempotency key of the current submission; kept across retries, cleared on success or edit
+  const [idempotencyKey, setIdempotencyKey] = useState<string | null>(null);
   const [result, setResult] = useState<{ subject?: string; content: string } | null>(null);
   const [cvProcessed, setCvProcessed] = useState(false);
   const [checkingCV, setCheckingCV] = useState(true);
-  const [history, setHistory] = useState<HistoryApplication[]>([]);
+  const [history, setHistory] = useState<ApplicationSummary[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loadingHistory, setLoadingHistory] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [selectedApp, setSelectedApp] = useState<HistoryApplication | null>(null);
   const router = useRouter();
 
@@ -76,7 +89,8 @@ export default function Application() {
     setLoadingHistory(true);
     try {
       const response = await applicationAPI.getHistory();
-      setHistory(response.data);
+      setHistory(response.data.items);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Error fetching history:', error);
     } finally {
@@ -84,6 +98,41 @@ export default function Application() {
     }
   };
 
+  const loadMoreHistory = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const response = await applicationAPI.getHistory(nextCursor);
+      setHistory((previous) => [...previous, ...response.data.items]);
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error('Error fetching history:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  // The history list only has summaries; the full application is loaded on demand
+  const fetchApplication = async (appId: number): Promise<HistoryApplication | null> => {
+    try {
+      const response = await applicationAPI.getDetail(appId);
+      return response.data;
+    } catch (error) {
+      message.error('Failed to load application');
+      return null;
+    }
+  };
+
+  const handleView = async (appId: number) => {
+    const app = await fetchApplication(appId);
+    if (app) setSelectedApp(app);
+  };
+
+  const handleCopyFromHistory = async (appId: number) => {
+    const app = await fetchApplication(appId);
+    if (app) handleCopy(app.content, app.subject || undefined);
+  };
+
   const checkCVStatus = async () => {
     try {
       const response = await cvAPI.getStatus();
@@ -106,11 +155,14 @@ export default function Application() {
     e.preventDefault();
     if (!jobDescription.trim()) return;
 
+    const key = idempotencyKey ?? newIdempotencyKey();
+    setIdempotencyKey(key);
     setLoading(true);
     setResult(null);
 
     try {
-      const response = await applicationAPI.generate(jobDescription, applicationType);
+      const response = await applicationAPI.generate(jobDescription, applicationType, key);
+      setIdempotencyKey(null);
       setResult(response.data);
       message.success('Application generated successfully!');
       fetchHistory(); // Refresh history
@@ -195,7 +247,10 @@ export default function Application() {
                       </Text>
                       <Radio.Group
                         value={applicationType}
-                        onChange={(e) => setApplicationType(e.target.value)}
+                        onChange={(e) => {
+                          setApplicationType(e.target.value);
+                          setIdempotencyKey(null);
+                        }}
                         disabled={loading}
                       >
                         <Radio.Button value="cover_letter">
@@ -214,7 +269,10 @@ export default function Application() {
                       </Text>
                       <TextArea
                         value={jobDescription}
-                        onChange={(e) => setJobDescription(e.target.value)}
+                        onChange={(e) => {
+                          setJobDescription(e.target.value);
+                          setIdempotencyKey(null);
+                        }}
                         rows={12}
                         placeholder="Paste the full job description here including requirements, responsibilities, and company information..."
                         disabled={loading}
@@ -358,14 +416,14 @@ export default function Application() {
                       <Button
                         type="text"
                         icon={<EyeOutlined />}
-                        onClick={() => setSelectedApp(item)}
+                        onClick={() => handleView(item.id)}
                       >
                         View
                       </Button>
                       <Button
                         type="text"
                         icon={<CopyOutlined />}
-                        onClick={() => handleCopy(item.content, item.subject || undefined)}
+                        onClick={() => handleCopyFromHistory(item.id)}
                       >
                         Copy
                       </Button>
@@ -397,11 +455,20 @@ export default function Application() {
                       </Text>
                     </div>
                     <Paragraph ellipsis={{ rows: 2 }} style={{ margin: 0 }}>
-                      {item.job_description}
+                      {item.job_description_snippet}
                     </Paragraph>
                   </Space>
                 </Card>
               )}
+              loadMore={
+                nextCursor && (
+                  <div style={{ textAlign: 'center', marginTop: '8px' }}>
+                    <Button onClick={loadMoreHistory} loading={loadingMore}>
+                      Load more
+                    </Button>
+                  </div>
+                )
+              }
             />
           )}
         </>
@@ -1,7 +1,7 @@
 import { useState, useEffect, useRef } from 'react';
 import { useRouter } from 'next/router';
 import { useAuth } from '@/contexts/AuthContext';
-import { chatAPI, cvAPI } from '@/lib/api';
+import { chatAPI, cvAPI, newIdempotencyKey } from '@/lib/api';
 import {
   Card,
   Input,
@@ -37,6 +37,8 @@ export default function Chat() {
   const [cvProcessed, setCvProcessed] = useState(false);
   const [checkingCV, setCheckingCV] = useState(true);
   const [historyLoading, setHistoryLoading] = useState(true);
+  // Idempotency key of the last question that failed, reused if the same question is sent again
+  const [pendingAsk, setPendingAsk] = useState<{ question: string; key: string } | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const router = useRouter();
 
@@ -61,7 +63,7 @@ export default function Chat() {
   const loadChatHistory = async () => {
     try {
       const response = await chatAPI.getHistory();
-      const historyMessages = response.data.flatMap((item: any) => [
+      const historyMessages = response.data.items.flatMap((item: any) => [
         {
           id: item.id * 2,
           type: 'user' as const,
@@ -111,12 +113,17 @@ export default function Chat() {
       content: input.trim(),
     };
 
+    const idempotencyKey =
+      pendingAsk?.question === userMessage.content ? pendingAsk.key : newIdempotencyKey();
+    setPendingAsk({ question: userMessage.content, key: idempotencyKey });
+
     setMessages((prev) => [...prev, userMessage]);
     setInput('');
     setLoading(true);
 
     try {
-      const response = await chatAPI.ask(userMessage.content);
+      const response = await chatAPI.ask(userMessage.content, idempotencyKey);
+      setPendingAsk(null);
       const assistantMessage: Message = {
         id: Date.now() + 1,
         type: 'assistant',
@@ -1,5 +1,12 @@
 import api from './client';
-import { LoginResponse, CVStatus, ChatHistory, ApplicationHistory, ApplicationResult } from '../types';
+import {
+  LoginResponse,
+  CVStatus,
+  ChatHistoryPage,
+  ApplicationHistory,
+  ApplicationHistoryPage,
+  ApplicationResult,
+} from '../types';
 
 // Auth API
 export const authAPI = {
@@ -50,8 +57,8 @@ export const chatAPI = {
     return response.data;
   },
 
-  getHistory: async (): Promise<ChatHistory[]> => {
-    const response = await api.get('/api/chat/history');
+  getHistory: async (cursor?: string): Promise<ChatHistoryPage> => {
+    const response = await api.get('/api/chat/history', { params: { cursor } });
     return response.data;
   },
 
@@ -79,8 +86,8 @@ export const applicationAPI = {
     return response.data;
   },
 
-  getHistory: async (): Promise<ApplicationHistory[]> => {
-    const response = await api.get('/api/application/history');
+  getHistory: async (cursor?: string): Promise<ApplicationHistoryPage> => {
+    const response = await api.get('/api/application/history', { params: { cursor } });
     return response.data;
   },
 
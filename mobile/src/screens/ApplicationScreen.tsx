@@ -14,7 +14,7 @@ import { SafeAreaView } from 'react-native-safe-area-context';
 import { applicationAPI } from '../api';
 import { Card, Button, Alert } from '../components';
 import { COLORS, SPACING } from '../utils/constants';
-import { ApplicationResult, ApplicationHistory } from '../types';
+import { ApplicationResult, ApplicationSummary } from '../types';
 import { Ionicons } from '@expo/vector-icons';
 
 export default function ApplicationScreen({ navigation }: any) {
@@ -22,7 +22,7 @@ export default function ApplicationScreen({ navigation }: any) {
   const [applicationType, setApplicationType] = useState<'cover_letter' | 'email'>('cover_letter');
   const [loading, setLoading] = useState(false);
   const [result, setResult] = useState<ApplicationResult | null>(null);
-  const [history, setHistory] = useState<ApplicationHistory[]>([]);
+  const [history, setHistory] = useState<ApplicationSummary[]>([]);
   const [loadingHistory, setLoadingHistory] = useState(false);
   const [showAllHistory, setShowAllHistory] = useState(false);
 
@@ -34,7 +34,7 @@ export default function ApplicationScreen({ navigation }: any) {
     setLoadingHistory(true);
     try {
       const data = await applicationAPI.getHistory();
-      setHistory(data);
+      setHistory(data.items);
     } catch (error) {
       console.error('Error fetching history:', error);
     } finally {
@@ -74,8 +74,14 @@ export default function ApplicationScreen({ navigation }: any) {
     }
   };
 
-  const handleViewHistory = (item: ApplicationHistory) => {
-    navigation.navigate('ApplicationDetail', { application: item });
+  const handleViewHistory = async (item: ApplicationSummary) => {
+    // History entries are summaries; the detail screen needs the full application
+    try {
+      const application = await applicationAPI.getDetail(item.id);
+      navigation.navigate('ApplicationDetail', { application });
+    } catch (error) {
+      RNAlert.alert('Error', 'Failed to load application');
+    }
   };
 
   const stripHtml = (html: string) => {
@@ -209,7 +215,7 @@ export default function ApplicationScreen({ navigation }: any) {
                     {item.application_type === 'email' ? 'Email' : 'Cover Letter'}
                   </Text>
                   <Text style={styles.historyDescription} numberOfLines={2}>
-                    {item.job_description}
+                    {item.job_description_snippet}
                   </Text>
                   <Text style={styles.historyDate}>
                     {new Date(item.created_at).toLocaleDateString()}
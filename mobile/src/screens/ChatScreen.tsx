@@ -13,7 +13,7 @@ import {
 } from 'react-native';
 import { SafeAreaView } from 'react-native-safe-area-context';
 import { chatAPI } from '../api';
-import { ChatMessage, ChatHistory } from '../types';
+import { ChatMessage, ChatHistoryPage } from '../types';
 import { COLORS, SPACING } from '../utils/constants';
 import { Ionicons } from '@expo/vector-icons';
 import { useAuth } from '../contexts/AuthContext';
@@ -41,8 +41,8 @@ export default function ChatScreen({ navigation }: any) {
 
   const loadChatHistory = async () => {
     try {
-      const history: ChatHistory[] = await chatAPI.getHistory();
-      const historyMessages: ChatMessage[] = history.flatMap((item) => [
+      const history: ChatHistoryPage = await chatAPI.getHistory();
+      const historyMessages: ChatMessage[] = history.items.flatMap((item) => [
         {
           id: item.id * 2,
           type: 'user' as const,
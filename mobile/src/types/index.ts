@@ -35,6 +35,11 @@ export interface ChatHistory {
   created_at: string;
 }
 
+export interface ChatHistoryPage {
+  items: ChatHistory[];
+  next_cursor: string | null;
+}
+
 export interface ApplicationHistory {
   id: number;
   job_description: string;
@@ -44,6 +49,20 @@ export interface ApplicationHistory {
   created_at: string;
 }
 
+export interface ApplicationSummary {
+  id: number;
+  application_type: 'cover_letter' | 'email';
+  subject: string | null;
+  snippet: string;
+  job_description_snippet: string;
+  created_at: string;
+}
+
+export interface ApplicationHistoryPage {
+  items: ApplicationSummary[];
+  next_cursor: string | null;
+}
+
 export interface ApplicationResult {
   subject?: string;
   content: string;